@@ -1,6 +1,13 @@
+import time
+# Everything from here to the first move counts towards the referee's deadline
+STARTUP_T0 = time.perf_counter()
+
+import os
 import sys
 import math
-import time
+import mmap
+
+from evalcache import EvalCache
 
 ADJACENCY = {
     "a1": ["a4", "d1"],
@@ -50,21 +57,170 @@ MILLS = [
     ["a7", "d7", "g7"]
 ]
 
+# Board points in a fixed order; a point's index here is used by every compact encoding
+POINTS = [
+    "a7", "d7", "g7",
+    "b6", "d6", "f6",
+    "c5", "d5", "e5",
+    "a4", "b4", "c4", "e4", "f4", "g4",
+    "c3", "d3", "e3",
+    "b2", "d2", "f2",
+    "a1", "d1", "g1"
+]
+POINT_INDEX = {p: i for i, p in enumerate(POINTS)}
+
+# For each point, the other two points of every mill line through it
+POINT_MILLS = {p: [tuple(t for t in triple if t != p) for triple in MILLS if p in triple] for p in POINTS}
+
+# The two MILLS lines (by index) through each point
+POINT_LINES = {p: [i for i, triple in enumerate(MILLS) if p in triple] for p in POINTS}
+
+# A line's state code is (blue stones) + 4 * (orange stones); LINE_UNIT is one stone's share
+LINE_UNIT = {"blue": 1, "orange": 4}
+FULL_LINE = {"blue": 3, "orange": 12}
+OPEN_TWO = {"blue": 2, "orange": 8}
+# Two opponent stones held off by one of ours
+BLOCKED_TWO = {"blue": 9, "orange": 6}
+
+# Precomputed tables are generated once and stored in a versioned cache file next to
+# this script, which later launches memory-map instead of rebuilding. Bump
+# TABLE_VERSION whenever the layout or the generator changes.
+TABLE_VERSION = 1
+TABLE_HEADER = b"SMTB" + TABLE_VERSION.to_bytes(4, "little")
+TABLE_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), f".stockmills-tables-v{TABLE_VERSION}.bin")
+N_ZOBRIST = len(POINTS) * 2 + 2 * 11 + 1
+
+def build_tables():
+    import random
+    rng = random.Random(20250301)
+    return [rng.getrandbits(64) for _ in range(N_ZOBRIST)]
+
+def load_tables(path=TABLE_CACHE):
+    """
+    Table values from the cache file, building (and trying to save) them on a miss.
+    Returns (values, cache_hit).
+    """
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if len(mm) == len(TABLE_HEADER) + 8 * N_ZOBRIST and mm[:len(TABLE_HEADER)] == TABLE_HEADER:
+                with memoryview(mm) as view, view[len(TABLE_HEADER):].cast("Q") as keys:
+                    return keys.tolist(), True
+    except (OSError, ValueError):
+        pass
+
+    values = build_tables()
+    try:
+        from array import array
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(TABLE_HEADER)
+            f.write(array("Q", values).tobytes())
+        os.replace(tmp, path)
+    except OSError:
+        pass
+    return values, False
+
+_tables_start = time.perf_counter()
+_zobrist_keys, TABLE_CACHE_HIT = load_tables()
+TABLE_LOAD_TIME = time.perf_counter() - _tables_start
+
+# Zobrist keys: one per (point, color) and per (color, stones in hand), plus the side to move
+ZOBRIST = {p: {"blue": _zobrist_keys[2 * i], "orange": _zobrist_keys[2 * i + 1]} for i, p in enumerate(POINTS)}
+ZOBRIST_HAND = {c: _zobrist_keys[48 + 11 * j:59 + 11 * j] for j, c in enumerate(("blue", "orange"))}
+ZOBRIST_ORANGE_TO_MOVE = _zobrist_keys[-1]
+
+# Seconds per move; the referee allows 5
+MOVE_TIME_LIMIT = 4.5
+
+# Proof-number search runs first once both hands are empty and a side is down to this many stones
+LOW_MATERIAL = 4
+PN_MAX_NODES = 50000
+PN_TIME_LIMIT = 1.5
+
+# Quiet flights searched per node in the flying phase, one per target point
+FLY_QUIET_LIMIT = 4
+
+# Positions kept in the game's repetition history; see record_position
+HISTORY_LIMIT = 64
+DRAW_SCORE = 0
+
+# Leaf evaluations kept between searches, keyed by position_key
+EVAL_CACHE_SIZE = 1 << 17
+EVAL_CACHE = EvalCache(EVAL_CACHE_SIZE)
+
+# Evaluation is a weighted sum of these features, all from the side to move's point of view
+FEATURE_NAMES = (["mill_stone", "potential_mill", "double_mill", "sliding_mill", "blocked_mill", "mobility"]
+                 + ["pos_" + p for p in POINTS])
+# Bumped whenever a feature's definition changes, so cached feature matrices are rebuilt
+FEATURES_VERSION = 2
+
+DEFAULT_WEIGHTS = {
+    "mill_stone": 100,
+    "potential_mill": 100,
+    "double_mill": 50,
+    "sliding_mill": 50,
+    "blocked_mill": 25,
+    "mobility": 10,
+    "pos_b2": 3, "pos_f4": 3, "pos_d2": 3, "pos_d6": 3,  # High value for center
+    "pos_a4": 2, "pos_g4": 2, "pos_d1": 2, "pos_d7": 2,  # Medium value for edges
+    "pos_a7": 1, "pos_g7": 1, "pos_a1": 1, "pos_g1": 1   # Low value for corners
+}
+
+WEIGHTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "weights.json")
+
+WEIGHTS = dict(DEFAULT_WEIGHTS)
+WEIGHT_VECTOR = [WEIGHTS.get(name, 0) for name in FEATURE_NAMES]
+
+def load_weights(path=WEIGHTS_FILE):
+    """
+    Replace the evaluation weights with the ones in a tuned weights file, if it exists.
+    Features missing from the file keep their default weight.
+    """
+    global WEIGHT_VECTOR
+    WEIGHTS.clear()
+    WEIGHTS.update(DEFAULT_WEIGHTS)
+    if path and os.path.exists(path):
+        import json
+        with open(path) as f:
+            WEIGHTS.update(json.load(f))
+    WEIGHT_VECTOR = [WEIGHTS.get(name, 0) for name in FEATURE_NAMES]
+    EVAL_CACHE.clear()
+    return WEIGHTS
+
 def create_initial_board():
-    valid_points = [
-        "a7", "d7", "g7",
-        "b6", "d6", "f6",
-        "c5", "d5", "e5",
-        "a4", "b4", "c4", "e4", "f4", "g4",
-        "c3", "d3", "e3",
-        "b2", "d2", "f2",
-        "a1", "d1", "g1"
-    ]
     board = {}
-    for pt in valid_points:
+    for pt in POINTS:
         board[pt] = None
     return board
 
+def position_to_notation(state):
+    """
+    Compact position notation: the 24 points in POINTS order (B blue, O orange, . empty),
+    then blue's and orange's stones in hand and the side to move (b/o), e.g.
+    "........................ 10 10 b" for the start position.
+    """
+    board = state["board"]
+    cells = "".join("B" if board[p] == "blue" else "O" if board[p] == "orange" else "." for p in POINTS)
+    return f"{cells} {state['in_hand']['blue']} {state['in_hand']['orange']} {state['current_player'][0]}"
+
+def parse_notation(text):
+    parts = text.split()
+    if len(parts) != 4 or len(parts[0]) != len(POINTS) or parts[3] not in ("b", "o"):
+        raise ValueError(f"bad position notation: {text!r}")
+    board = create_initial_board()
+    for p, ch in zip(POINTS, parts[0]):
+        if ch == "B":
+            board[p] = "blue"
+        elif ch == "O":
+            board[p] = "orange"
+        elif ch != ".":
+            raise ValueError(f"bad point {ch!r} in position notation")
+    return {
+        "board": board,
+        "in_hand": {"blue": int(parts[1]), "orange": int(parts[2])},
+        "current_player": "blue" if parts[3] == "b" else "orange"
+    }
+
 def hand_src(color):
     return "h1" if color == "blue" else "h2"
 
@@ -113,25 +269,20 @@ def forms_mill_after_move(board, source, target, color):
     board[target] = old_tgt
     return res
 
-def generate_moves(state):
+def move_targets(state):
     """
-    Generate all valid moves for player state as a list of tuples.
+    All (source, target) steps for the side to move, before mill/removal expansion.
     """
     board = state["board"]
     color = state["current_player"]
-    opp = "blue" if color == "orange" else "orange"
     in_hand = state["in_hand"][color]
-    moves = []
+    steps = []
 
     if in_hand > 0:
+        src = hand_src(color)
         for point, occupant in board.items():
             if occupant is None:
-                if forms_mill_after_placement(board, point, color):
-                    remove_list = possible_removals(board, opp)
-                    for rpos in remove_list:
-                        moves.append((hand_src(color), point, rpos))
-                else:
-                    moves.append((hand_src(color), point, "r0"))
+                steps.append((src, point))
 
     my_positions = [p for p, occupant in board.items() if occupant == color]
     can_fly = (len(my_positions) + in_hand == 3)
@@ -140,48 +291,380 @@ def generate_moves(state):
         if can_fly:
             for tgt, occupant in board.items():
                 if occupant is None:
-                    if forms_mill_after_move(board, src, tgt, color):
-                        remove_list = possible_removals(board, opp)
-                        for rpos in remove_list:
-                            moves.append((src, tgt, rpos))
-                    else:
-                        moves.append((src, tgt, "r0"))
+                    steps.append((src, tgt))
         else:
             for tgt in ADJACENCY.get(src, []):
                 if board[tgt] is None:
-                    if forms_mill_after_move(board, src, tgt, color):
-                        remove_list = possible_removals(board, opp)
-                        for rpos in remove_list:
-                            moves.append((src, tgt, rpos))
-                    else:
-                        moves.append((src, tgt, "r0"))
-    return moves
+                    steps.append((src, tgt))
+    return steps
+
+def line_codes(board):
+    lines = [0] * len(MILLS)
+    for i, triple in enumerate(MILLS):
+        for p in triple:
+            if board[p] is not None:
+                lines[i] += LINE_UNIT[board[p]]
+    return lines
+
+def get_lines(state):
+    """
+    The mill-line state table of a state. It is built once and then kept up to date by
+    apply_move, touching only the lines through the points that changed.
+    """
+    lines = state.get("lines")
+    if lines is None:
+        lines = state["lines"] = line_codes(state["board"])
+    return lines
+
+def board_key(state):
+    key = ZOBRIST_HAND["blue"][state["in_hand"]["blue"]] ^ ZOBRIST_HAND["orange"][state["in_hand"]["orange"]]
+    for p, occupant in state["board"].items():
+        if occupant is not None:
+            key ^= ZOBRIST[p][occupant]
+    return key
+
+def position_key(state):
+    """
+    64-bit hash of the position including the side to move. The board and hands part
+    is cached on the state and updated incrementally by apply_move.
+    """
+    key = state.get("key")
+    if key is None:
+        key = state["key"] = board_key(state)
+    if state["current_player"] == "orange":
+        key ^= ZOBRIST_ORANGE_TO_MOVE
+    return key
+
+def open_twos(lines, color):
+    """Lines holding two of color's stones and an empty point."""
+    code = OPEN_TWO[color]
+    return sum(1 for c in lines if c == code)
+
+def blocked_mills(lines, color):
+    """Opponent twos that color has already blocked."""
+    code = BLOCKED_TWO[color]
+    return sum(1 for c in lines if c == code)
+
+def mill_stones(lines, color):
+    """Number of color's stones standing in at least one closed mill."""
+    code = FULL_LINE[color]
+    return len({p for i, c in enumerate(lines) if c == code for p in MILLS[i]})
+
+def double_mill_points(state, color):
+    """Empty points that would close two of color's mills at once."""
+    board = state["board"]
+    lines = get_lines(state)
+    code = OPEN_TWO[color]
+    return sum(1 for p in POINTS if board[p] is None and all(lines[i] == code for i in POINT_LINES[p]))
+
+def sliding_mills(state, color):
+    """
+    Stones that can slide out of a closed mill onto an empty neighbour that closes
+    another mill, and slide back next turn to close the first one again.
+    """
+    board = state["board"]
+    lines = get_lines(state)
+    full = FULL_LINE[color]
+    two = OPEN_TWO[color]
+    count = 0
+    for p in POINTS:
+        if board[p] != color or not any(lines[i] == full for i in POINT_LINES[p]):
+            continue
+        for q in ADJACENCY[p]:
+            if board[q] is None and any(lines[i] == two and p not in MILLS[i] for i in POINT_LINES[q]):
+                count += 1
+                break
+    return count
+
+def threat_order(lines, source, target, color):
+    """
+    Ordering key for quiet moves: blocking an opponent two beats building one of our own.
+    """
+    opp_two = OPEN_TWO["blue" if color == "orange" else "orange"]
+    single = LINE_UNIT[color]
+    score = 0
+    for i in POINT_LINES[target]:
+        if source in MILLS[i]:
+            continue
+        if lines[i] == opp_two:
+            score += 2
+        elif lines[i] == single:
+            score += 1
+    return score
+
+def step_forms_mill(board, source, target, color):
+    """
+    Same answer as forms_mill_after_placement/forms_mill_after_move, from the two lines
+    through target only and without touching the board.
+    """
+    for a, b in POINT_MILLS[target]:
+        if board[a] == color and board[b] == color and a != source and b != source:
+            return True
+    return False
+
+def count_moves(state, color):
+    """
+    len(generate_moves) for color, counted from the board without building any moves.
+    """
+    board = state["board"]
+    opp = "blue" if color == "orange" else "orange"
+    in_hand = state["in_hand"][color]
+    empties = [p for p, occupant in board.items() if occupant is None]
+    mills = 0
+    quiet = 0
+
+    if in_hand > 0:
+        for point in empties:
+            if step_forms_mill(board, "h", point, color):
+                mills += 1
+            else:
+                quiet += 1
+
+    my_positions = [p for p, occupant in board.items() if occupant == color]
+    can_fly = (len(my_positions) + in_hand == 3)
+
+    for src in my_positions:
+        for tgt in (empties if can_fly else ADJACENCY[src]):
+            if board[tgt] is None:
+                if step_forms_mill(board, src, tgt, color):
+                    mills += 1
+                else:
+                    quiet += 1
+
+    if mills:
+        return quiet + mills * len(possible_removals(board, opp))
+    return quiet
+
+def has_any_move(state, color):
+    """
+    Whether color has at least one legal move; stops at the first one found.
+    """
+    board = state["board"]
+    in_hand = state["in_hand"][color]
+    empties = [p for p, occupant in board.items() if occupant is None]
+    # A mill with nothing to remove yields no move, so mill steps only count if the
+    # opponent has a stone on the board
+    opp = "blue" if color == "orange" else "orange"
+    opp_on_board = any(occupant == opp for occupant in board.values())
+
+    if in_hand > 0:
+        for point in empties:
+            if opp_on_board or not step_forms_mill(board, "h", point, color):
+                return True
+
+    my_positions = [p for p, occupant in board.items() if occupant == color]
+    can_fly = (len(my_positions) + in_hand == 3)
+
+    for src in my_positions:
+        for tgt in (empties if can_fly else ADJACENCY[src]):
+            if board[tgt] is None:
+                if opp_on_board or not step_forms_mill(board, src, tgt, color):
+                    return True
+    return False
+
+def is_legal_move(state, move):
+    """
+    Check a move from outside the generator (hash/PV or killer move) against this position.
+    """
+    src, tgt, rem = move
+    board = state["board"]
+    color = state["current_player"]
+    in_hand = state["in_hand"][color]
+    if board.get(tgt, color) is not None:
+        return False
+    if src.startswith("h"):
+        if src != hand_src(color) or in_hand == 0:
+            return False
+    else:
+        if board.get(src) != color:
+            return False
+        if count_on_board(board, color) + in_hand != 3 and tgt not in ADJACENCY[src]:
+            return False
+    if step_forms_mill(board, src, tgt, color):
+        opp = "blue" if color == "orange" else "orange"
+        return rem in possible_removals(board, opp)
+    return rem == "r0"
+
+def iter_moves(state, hash_move=None, killers=()):
+    """
+    Yield moves in search order, one stage at a time: the hash/PV move, then mill-closing
+    moves with their removals, then killer moves, then the remaining quiet moves.
+    A stage is only computed once the caller has consumed the previous one.
+    """
+    board = state["board"]
+    color = state["current_player"]
+    opp = "blue" if color == "orange" else "orange"
+    done = []
+
+    if hash_move is not None and is_legal_move(state, hash_move):
+        done.append(hash_move)
+        yield hash_move
+
+    quiet = []
+    remove_list = None
+    for src, tgt in move_targets(state):
+        if step_forms_mill(board, src, tgt, color):
+            if remove_list is None:
+                remove_list = possible_removals(board, opp)
+            for rpos in remove_list:
+                move = (src, tgt, rpos)
+                if move not in done:
+                    yield move
+        else:
+            quiet.append((src, tgt, "r0"))
+
+    for move in killers:
+        if move not in done and move[2] == "r0" and move in quiet:
+            done.append(move)
+            yield move
+
+    lines = get_lines(state)
+    quiet.sort(key=lambda m: threat_order(lines, m[0], m[1], color), reverse=True)
+    for move in quiet:
+        if move not in done:
+            yield move
+
+def is_flying(state):
+    color = state["current_player"]
+    return state["in_hand"][color] == 0 and count_on_board(state["board"], color) == 3
+
+def line_counts(code, color):
+    """(own stones, opponent stones) on a line, from its state code."""
+    if color == "blue":
+        return code % 4, code // 4
+    return code // 4, code % 4
+
+def source_cost(lines, src, color):
+    """How much structure a stone gives up by leaving src: own lines it sits in, blocks it holds."""
+    cost = 0
+    for i in POINT_LINES[src]:
+        mine, theirs = line_counts(lines[i], color)
+        if theirs == 2:
+            cost += 2
+        elif theirs == 0:
+            cost += mine - 1
+    return cost
+
+def flying_moves(state, hash_move=None, killers=()):
+    """
+    Move order for a side with three stones, where every stone can fly to any empty
+    point. Mill-closing flights come first (with removals), then flights that block an
+    opponent two, then flights that build a two of our own. Quiet flights are
+    deduplicated to one per target point, taking the stone that gives up the least,
+    and only the FLY_QUIET_LIMIT best of them are searched.
+    """
+    board = state["board"]
+    color = state["current_player"]
+    opp = "blue" if color == "orange" else "orange"
+    lines = get_lines(state)
+    opp_two = OPEN_TWO[opp]
+    single = LINE_UNIT[color]
+    done = []
+
+    if hash_move is not None and is_legal_move(state, hash_move):
+        done.append(hash_move)
+        yield hash_move
+
+    my_positions = [p for p, occupant in board.items() if occupant == color]
+    empties = [p for p, occupant in board.items() if occupant is None]
+    blocking, building, quiet = [], [], {}
+    remove_list = None
+
+    for src in my_positions:
+        for tgt in empties:
+            if step_forms_mill(board, src, tgt, color):
+                if remove_list is None:
+                    remove_list = possible_removals(board, opp)
+                for rpos in remove_list:
+                    move = (src, tgt, rpos)
+                    if move not in done:
+                        yield move
+                continue
+            through = [lines[i] for i in POINT_LINES[tgt] if src not in MILLS[i]]
+            if opp_two in through:
+                blocking.append((src, tgt, "r0"))
+            elif single in through:
+                building.append((src, tgt, "r0"))
+            else:
+                cost = source_cost(lines, src, color)
+                if tgt not in quiet or cost < quiet[tgt][0]:
+                    quiet[tgt] = (cost, (src, tgt, "r0"))
+
+    for move in blocking + building:
+        if move not in done:
+            done.append(move)
+            yield move
+
+    for move in killers:
+        if move not in done and move[2] == "r0" and is_legal_move(state, move):
+            done.append(move)
+            yield move
+
+    ranked = sorted(quiet.values(), key=lambda entry: (entry[0], -WEIGHTS.get("pos_" + entry[1][1], 0)))
+    for _, move in ranked[:FLY_QUIET_LIMIT]:
+        if move not in done:
+            yield move
+
+def generate_moves(state):
+    """
+    Generate all valid moves for player state as a list of tuples.
+    """
+    return list(iter_moves(state))
 
 def apply_move(state, source, target, remove):
     new_state = clone_state(state)
     board = new_state["board"]
     color = new_state["current_player"]
 
+    opp = "blue" if color == "orange" else "orange"
+    lines = new_state.get("lines")
+    key = new_state.get("key")
+
     if source.startswith("h"):
-        new_state["in_hand"][color] -= 1
+        hand = new_state["in_hand"][color]
+        new_state["in_hand"][color] = hand - 1
+        if key is not None:
+            key ^= ZOBRIST_HAND[color][hand] ^ ZOBRIST_HAND[color][hand - 1]
     else:
         board[source] = None
+        if lines is not None:
+            for i in POINT_LINES[source]:
+                lines[i] -= LINE_UNIT[color]
+        if key is not None:
+            key ^= ZOBRIST[source][color]
 
     board[target] = color
+    if lines is not None:
+        for i in POINT_LINES[target]:
+            lines[i] += LINE_UNIT[color]
+    if key is not None:
+        key ^= ZOBRIST[target][color]
 
     if remove != "r0":
         board[remove] = None
+        if lines is not None:
+            for i in POINT_LINES[remove]:
+                lines[i] -= LINE_UNIT[opp]
+        if key is not None:
+            key ^= ZOBRIST[remove][opp]
 
-    new_state["current_player"] = "blue" if color == "orange" else "orange"
+    if key is not None:
+        new_state["key"] = key
+    new_state["current_player"] = opp
     return new_state
 
 def clone_state(state):
     """Return a deep copy of the state."""
-    return {
+    new_state = {
         "board": dict(state["board"]),
         "in_hand": dict(state["in_hand"]),
         "current_player": state["current_player"]
     }
+    if "lines" in state:
+        new_state["lines"] = list(state["lines"])
+    if "key" in state:
+        new_state["key"] = state["key"]
+    return new_state
 
 def is_terminal(state):
     board = state["board"]
@@ -191,7 +674,7 @@ def is_terminal(state):
         return True
     if state["in_hand"]["orange"] == 0 and corange <= 2:
         return True
-    return len(generate_moves(state)) == 0
+    return not has_any_move(state, state["current_player"])
 
 def utility(state):
     board = state["board"]
@@ -204,131 +687,348 @@ def utility(state):
         return -999999
     if oppcount <= 2:
         return 999999
-    if not generate_moves(state):
+    if not has_any_move(state, color):
         return -999999
     return 0
 
 
-def evaluate(state):
+def evaluation_features(state):
+    """
+    Feature values for the side to move, in FEATURE_NAMES order.
+    """
     board = state["board"]
     color = state["current_player"]
     opp = "blue" if color == "orange" else "orange"
-    score = 0
+    lines = get_lines(state)
 
     # Mill-based scoring
-    player_mills = sum(1 for pos, occupant in board.items() if occupant == color and is_stone_in_mill(board, pos, color))
-    opp_mills = sum(1 for pos, occupant in board.items() if occupant == opp and is_stone_in_mill(board, pos, opp))
-    score += 100 * (player_mills - opp_mills)
-
-    # Potential Mills
-    player_potential_mills = sum(1 for pos in board if board[pos] == color and forms_mill_after_placement(board, pos, color))
-    opponent_potential_mills = sum(1 for pos in board if board[pos] == color and forms_mill_after_placement(board, pos, opp))
-    score += 100 * (player_potential_mills - opponent_potential_mills) # Reward for setting up mills
-
-    # Positional advantage
-    position_weights = {
-        'b2': 3, 'f4': 3, 'd2': 3, 'd6': 3,  # High value for center
-        'a4': 2, 'g4': 2, 'd1': 2, 'd7': 2,  # Medium value for edges
-        'a7': 1, 'g7': 1, 'a1': 1, 'g1': 1   # Low value for corners
-    }
-    for pos, occupant in board.items():
-        if occupant == color:
-            score += position_weights.get(pos, 0)
-        else:
-            score -= position_weights.get(pos, 0)
-        if state["in_hand"] == 0 and is_stone_in_mill(board, pos, color):
-            score -= 15
+    player_mills = mill_stones(lines, color)
+    opp_mills = mill_stones(lines, opp)
+
+    # Potential Mills (two stones and an empty point on a line)
+    player_potential_mills = open_twos(lines, color)
+    opponent_potential_mills = open_twos(lines, opp)
 
     # Mobility (number of legal moves)
-    player_mobility = len(generate_moves(state))
-    temp_state = clone_state(state)
-    temp_state["current_player"] = opp
-    opponent_mobility = len(generate_moves(temp_state))
-    score += 10 * (player_mobility - opponent_mobility)
+    player_mobility = count_moves(state, color)
+    opponent_mobility = count_moves(state, opp)
 
-    return score
+    features = [
+        player_mills - opp_mills,
+        player_potential_mills - opponent_potential_mills,
+        double_mill_points(state, color) - double_mill_points(state, opp),
+        sliding_mills(state, color) - sliding_mills(state, opp),
+        blocked_mills(lines, color) - blocked_mills(lines, opp),
+        player_mobility - opponent_mobility,
+    ]
+    # Positional advantage: +1 for our stone, -1 for theirs, 0 when empty
+    features.extend(1 if board[pos] == color else -1 if board[pos] == opp else 0 for pos in POINTS)
+    return features
+
+
+def evaluate(state):
+    return sum(w * f for w, f in zip(WEIGHT_VECTOR, evaluation_features(state)))
 
 
 def evaluate_or_utility(state):
-    if is_terminal(state):
-        return utility(state)
-    return evaluate(state)
+    key = position_key(state)
+    value = EVAL_CACHE.get(key)
+    if value is None:
+        value = utility(state) if is_terminal(state) else evaluate(state)
+        EVAL_CACHE.put(key, value)
+    return value
 
-def minimax_alpha_beta(state, alpha, beta, depth, max_depth, maximizing, start_time, time_limit):
-    if time.time() - start_time >= time_limit:
-        return evaluate_or_utility(state), None
+def leaf_score(state, maximizing):
+    """
+    evaluate_or_utility scores for the side to move; the search scores for the root
+    player, who is the side to move at maximizing nodes.
+    """
+    score = evaluate_or_utility(state)
+    return score if maximizing else -score
+
+def new_search_context(history=()):
+    """
+    Per-search bookkeeping shared by every node of one iterative_deepening call.
+    history holds the position keys already played in the game.
+    """
+    ctx = {"killers": {}, "pv_move": None, "path": [], "seen": {},
+           "nodes": 0, "node_limit": None, "pv": {},
+           "split_removal": False, "removal_killers": {}, "stopped": False}
+    for key in history:
+        push_position(ctx, key)
+    return ctx
+
+def push_position(ctx, key):
+    ctx["path"].append(key)
+    ctx["seen"][key] = ctx["seen"].get(key, 0) + 1
+
+def pop_position(ctx):
+    key = ctx["path"].pop()
+    count = ctx["seen"][key] - 1
+    if count:
+        ctx["seen"][key] = count
+    else:
+        del ctx["seen"][key]
+
+def record_position(history, state, move):
+    """
+    Add the position reached by move to the game history. Placements and removals can
+    never be undone, so nothing before them can repeat and the history starts over.
+    """
+    src, _, rem = move
+    if src.startswith("h") or rem != "r0":
+        history.clear()
+    history.append(position_key(state))
+    del history[:-HISTORY_LIMIT]
+
+def store_killer(ctx, depth, move):
+    # Only quiet moves; mill-closing moves are already searched early
+    if move[2] != "r0":
+        return
+    killers = ctx["killers"].setdefault(depth, [])
+    if move not in killers:
+        killers.insert(0, move)
+        del killers[2:]
+
+def out_of_budget(ctx, start_time, time_limit):
+    """
+    True once the search has to stop: it has searched node_limit nodes or run out of
+    time. It stays stopped, so a node budget is never exceeded and the interrupted
+    iteration can be recognised and thrown away.
+    """
+    if not ctx["stopped"]:
+        limit = ctx["node_limit"]
+        if (limit is not None and ctx["nodes"] >= limit) or time.time() - start_time >= time_limit:
+            ctx["stopped"] = True
+    return ctx["stopped"]
+
+def minimax_alpha_beta(state, alpha, beta, depth, max_depth, maximizing, start_time, time_limit, ctx=None):
+    if ctx is None:
+        ctx = new_search_context()
+    ctx["pv"][depth] = []
+    if out_of_budget(ctx, start_time, time_limit):
+        return leaf_score(state, maximizing), None
+    ctx["nodes"] += 1
+    key = position_key(state)
+    # A repeated position is a draw; don't search the cycle again
+    if depth > 0 and key in ctx["seen"]:
+        return DRAW_SCORE, None
     if depth >= max_depth or is_terminal(state):
-        return evaluate_or_utility(state), None
+        return leaf_score(state, maximizing), None
+
+    hash_move = ctx["pv_move"] if depth == 0 else None
+    killers = ctx["killers"].get(depth, ())
+    # The root always sees every move; below it flying sides use the pruned order
+    if depth > 0 and is_flying(state):
+        moves = flying_moves(state, hash_move, killers)
+    else:
+        moves = iter_moves(state, hash_move, killers)
+    push_position(ctx, key)
 
-    moves = generate_moves(state)
-    if not moves:
-        return evaluate_or_utility(state), None
+    # With split removal, a mill-closing step is searched once and its removal is
+    # chosen by search_removal, so skip the other removals of a step already seen
+    split_steps = set() if ctx["split_removal"] else None
 
     if maximizing:
         best_val = -math.inf
         best_move = None
-        for (src, tgt, rem) in moves:
-            nxt_state = apply_move(state, src, tgt, rem)
-            val, _ = minimax_alpha_beta(nxt_state, alpha, beta, depth + 1, max_depth, False, start_time, time_limit)
+        for move in moves:
+            if split_steps is not None and move[2] != "r0":
+                if move[:2] in split_steps:
+                    continue
+                split_steps.add(move[:2])
+            val, move = search_move(state, move, alpha, beta, depth, max_depth, True, start_time, time_limit, ctx)
             if val > best_val:
                 best_val = val
-                best_move = (src, tgt, rem)
+                best_move = move
+                ctx["pv"][depth] = [best_move] + ctx["pv"].get(depth + 1, [])
             alpha = max(alpha, best_val)
             if beta <= alpha:
+                store_killer(ctx, depth, best_move)
                 break
+        pop_position(ctx)
+        if best_move is None:
+            return leaf_score(state, maximizing), None
         return best_val, best_move
     else:
         worst_val = math.inf
         worst_move = None
-        for (src, tgt, rem) in moves:
-            nxt_state = apply_move(state, src, tgt, rem)
-            val, _ = minimax_alpha_beta(nxt_state, alpha, beta, depth + 1, max_depth, True, start_time, time_limit)
+        for move in moves:
+            if split_steps is not None and move[2] != "r0":
+                if move[:2] in split_steps:
+                    continue
+                split_steps.add(move[:2])
+            val, move = search_move(state, move, alpha, beta, depth, max_depth, False, start_time, time_limit, ctx)
             if val < worst_val:
                 worst_val = val
-                worst_move = (src, tgt, rem)
+                worst_move = move
+                ctx["pv"][depth] = [worst_move] + ctx["pv"].get(depth + 1, [])
             beta = min(beta, worst_val)
             if beta <= alpha:
+                store_killer(ctx, depth, worst_move)
                 break
+        pop_position(ctx)
+        if worst_move is None:
+            return leaf_score(state, maximizing), None
         return worst_val, worst_move
 
-def iterative_deepening(state, max_iter_depth, time_limit):
+def search_move(state, move, alpha, beta, depth, max_depth, maximizing, start_time, time_limit, ctx):
+    """
+    Value of playing move at this node. Returns (value, move); in split-removal mode the
+    removal of a mill-closing move is picked by its own ply, so the move returned may
+    differ from the one passed in.
+    """
+    src, tgt, rem = move
+    if ctx["split_removal"] and rem != "r0":
+        return search_removal(state, src, tgt, alpha, beta, depth, max_depth, maximizing, start_time, time_limit, ctx)
+    nxt_state = apply_move(state, src, tgt, rem)
+    val, _ = minimax_alpha_beta(nxt_state, alpha, beta, depth + 1, max_depth, not maximizing, start_time, time_limit, ctx)
+    return val, move
+
+def removal_order(lines, board, pos, opp):
+    """
+    Ordering key for removing the opponent stone at pos: breaking up one of their open
+    twos first, then taking their most mobile stones.
+    """
+    score = 0
+    for i in POINT_LINES[pos]:
+        if line_counts(lines[i], opp) == (2, 0):
+            score += 4
+    return score + sum(1 for q in ADJACENCY[pos] if board[q] is None)
+
+def search_removal(state, src, tgt, alpha, beta, depth, max_depth, maximizing, start_time, time_limit, ctx):
+    """
+    Removal ply for a mill closed by src->tgt: the same player picks which stone to take,
+    with its own move ordering (killer removal first) and alpha-beta cutoffs. It does not
+    count towards the search depth.
+    """
+    board = state["board"]
+    color = state["current_player"]
+    opp = "blue" if color == "orange" else "orange"
+    lines = get_lines(state)
+    removals = sorted(possible_removals(board, opp), key=lambda r: removal_order(lines, board, r, opp), reverse=True)
+    if out_of_budget(ctx, start_time, time_limit):
+        return leaf_score(state, maximizing), (src, tgt, removals[0])
+    ctx["nodes"] += 1
+    killer = ctx["removal_killers"].get(depth)
+    if killer in removals:
+        removals.remove(killer)
+        removals.insert(0, killer)
+
+    best_val = -math.inf if maximizing else math.inf
+    best_rem = None
+    best_pv = []
+    for rpos in removals:
+        nxt_state = apply_move(state, src, tgt, rpos)
+        val, _ = minimax_alpha_beta(nxt_state, alpha, beta, depth + 1, max_depth, not maximizing, start_time, time_limit, ctx)
+        if (val > best_val) if maximizing else (val < best_val):
+            best_val = val
+            best_rem = rpos
+            best_pv = ctx["pv"].get(depth + 1, [])
+        if maximizing:
+            alpha = max(alpha, best_val)
+        else:
+            beta = min(beta, best_val)
+        if beta <= alpha:
+            ctx["removal_killers"][depth] = rpos
+            break
+    ctx["pv"][depth + 1] = best_pv
+    return best_val, (src, tgt, best_rem)
+
+def iterative_deepening(state, max_iter_depth, time_limit, history=(), split_removal=False, node_limit=None):
+    """
+    Deepen until max_iter_depth, time_limit seconds or node_limit nodes, whichever
+    comes first, and return the result of the last completed iteration. Without a
+    time limit the result depends only on the position, the history and the limits.
+    """
     start = time.time()
     best_val_global = -math.inf
     best_move_global = None
+    ctx = new_search_context(history)
+    ctx["split_removal"] = split_removal
+    ctx["node_limit"] = node_limit
 
     for depth in range(1, max_iter_depth + 1):
-        if time.time() - start >= time_limit:
+        if out_of_budget(ctx, start, time_limit):
             break
-        val, move = minimax_alpha_beta(state, -math.inf, math.inf, 0, depth, True, start, time_limit)
-        if time.time() - start >= time_limit:
+        ctx["pv_move"] = best_move_global
+        val, move = minimax_alpha_beta(state, -math.inf, math.inf, 0, depth, True, start, time_limit, ctx)
+        if ctx["stopped"]:
             break
         if move is not None:
             best_val_global = val
             best_move_global = move
     return best_val_global, best_move_global
 
-def main():
+def send_move(write, move):
+    s, t, r = move
+    write(f"{s} {t} {r}")
+
+def is_low_material(state):
+    if state["in_hand"]["blue"] or state["in_hand"]["orange"]:
+        return False
+    board = state["board"]
+    return min(count_on_board(board, "blue"), count_on_board(board, "orange")) <= LOW_MATERIAL
+
+def choose_move(state, max_iter_depth, history=(), split_removal=False, node_limit=None, time_limit=MOVE_TIME_LIMIT):
+    start = time.time()
+    if is_low_material(state):
+        import pns
+        # Without a clock (node budget or fixed depth) only PN_MAX_NODES bounds the
+        # proof, so its result does not depend on machine load either
+        reproducible = node_limit is not None or time_limit == math.inf
+        pn_time = math.inf if reproducible else min(PN_TIME_LIMIT, time_limit)
+        result, line = pns.proof_number_search(state, PN_MAX_NODES, pn_time, history)
+        # A proven win needs no further search
+        if result == "win":
+            return line[0]
+    time_limit -= time.time() - start
+    _, best_move = iterative_deepening(state, max_iter_depth=max_iter_depth, time_limit=time_limit,
+                                       history=history, split_removal=split_removal, node_limit=node_limit)
+    if not best_move:
+        moves = generate_moves(state)
+        best_move = moves[0] if moves else ("h1", "a4", "r0")
+    return best_move
+
+def play_game(readline, write, engine="alphabeta", workers=1, split_removal=False, node_limit=None, depth=None):
+    """
+    Play one game over the referee protocol. readline returns the next input line
+    ("" at end of input) and write sends one output line; main uses stdin/stdout,
+    the engine daemon a socket.
+    A node_limit per move or a fixed depth replaces the clock, so every move is
+    reproducible whatever the machine load.
+    """
+    if engine == "mcts":
+        import mcts
+        player = mcts.MCTSPlayer(time_limit=MOVE_TIME_LIMIT, workers=workers)
+        try:
+            play_game_mcts(readline, write, player)
+        finally:
+            player.close()
+        return
+
     board = create_initial_board()
     in_hand = {"blue": 10, "orange": 10}
     state = {"board": board, "in_hand": in_hand, "current_player": "blue"}
 
-    color = sys.stdin.readline().strip()
+    color = readline().strip()
     if color not in ["blue", "orange"]:
         return
+    history = []
+    limits = {"split_removal": split_removal, "node_limit": node_limit}
+    if node_limit is not None or depth is not None:
+        limits["time_limit"] = math.inf
 
     # Blue always starts
     if color == "blue":
-        _, best_move = iterative_deepening(state, max_iter_depth=4, time_limit=4.5)
-        if not best_move:
-            moves = generate_moves(state)
-            best_move = moves[0] if moves else ("h1", "a4", "r0")
-        s, t, r = best_move
-        print(f"{s} {t} {r}", flush=True)
-        state = apply_move(state, s, t, r)
+        best_move = choose_move(state, max_iter_depth=depth or 4, **limits)
+        send_move(write, best_move)
+        state = apply_move(state, *best_move)
+        record_position(history, state, best_move)
 
     while True:
         try:
-            line = sys.stdin.readline().strip()
+            line = readline().strip()
             if not line or line.startswith("END"):
                 break
 
@@ -337,18 +1037,96 @@ def main():
             if len(parts) == 3:
                 o_src, o_tgt, o_rem = parts
                 state = apply_move(state, o_src, o_tgt, o_rem)
+                record_position(history, state, parts)
 
             # Calculate our move
             state["current_player"] = color
-            _, best_move = iterative_deepening(state, max_iter_depth=10, time_limit=4.5)
-            if not best_move:
-                moves = generate_moves(state)
-                best_move = moves[0] if moves else ("h1", "a4", "r0")
-            s, t, r = best_move
-            print(f"{s} {t} {r}", flush=True)
-            state = apply_move(state, s, t, r)
+            best_move = choose_move(state, max_iter_depth=depth or 10, history=history, **limits)
+            send_move(write, best_move)
+            state = apply_move(state, *best_move)
+            record_position(history, state, best_move)
         except EOFError:
             break
 
+def play_game_mcts(readline, write, player):
+    state = {"board": create_initial_board(), "in_hand": {"blue": 10, "orange": 10}, "current_player": "blue"}
+
+    color = readline().strip()
+    if color not in ["blue", "orange"]:
+        return
+
+    while True:
+        if state["current_player"] != color:
+            line = readline().strip()
+            if not line or line.startswith("END"):
+                break
+            parts = line.split()
+            if len(parts) == 3:
+                state = apply_move(state, *parts)
+                player.advance(parts)
+            state["current_player"] = color
+
+        best_move = player.search(state)
+        if not best_move:
+            moves = generate_moves(state)
+            best_move = moves[0] if moves else ("h1", "a4", "r0")
+        send_move(write, best_move)
+        state = apply_move(state, *best_move)
+        player.advance(best_move)
+
+ENGINE_DEFAULTS = {"engine": "alphabeta", "workers": 1, "split_removal": False, "nodes": None, "depth": None,
+                   "profile": None, "startup_benchmark": False}
+
+def parse_engine_args(argv):
+    if not argv:
+        # The referee passes no arguments; skip loading argparse on that path
+        import types
+        return types.SimpleNamespace(**ENGINE_DEFAULTS)
+    import argparse
+    parser = argparse.ArgumentParser(description="StockMills Lasker Morris engine (referee stdin/stdout protocol)")
+    parser.add_argument("--engine", choices=["alphabeta", "mcts"], default="alphabeta")
+    parser.add_argument("--workers", type=int, default=1, help="processes for root-parallel MCTS")
+    parser.add_argument("--split-removal", action="store_true",
+                        help="search the removal after a mill as its own ply")
+    parser.add_argument("--nodes", type=int, help="search this many nodes per move instead of using the clock")
+    parser.add_argument("--depth", type=int, help="search to this fixed depth instead of using the clock")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="time the engine's hot paths; report on stderr, collapsed stacks to FILE")
+    parser.add_argument("--startup-benchmark", action="store_true",
+                        help="report startup and time-to-first-move, then exit")
+    return parser.parse_args(argv)
+
+def startup_benchmark(ready):
+    state = {"board": create_initial_board(), "in_hand": {"blue": 10, "orange": 10}, "current_player": "blue"}
+    move = choose_move(state, max_iter_depth=4)
+    done = time.perf_counter()
+    print(f"module load      {1000 * (ready - STARTUP_T0):8.1f} ms")
+    print(f"  tables         {1000 * TABLE_LOAD_TIME:8.1f} ms ({'cache hit' if TABLE_CACHE_HIT else 'built'})")
+    print(f"first move       {1000 * (done - ready):8.1f} ms ({' '.join(move)})")
+    print(f"time-to-first-move {1000 * (done - STARTUP_T0):6.1f} ms (plus interpreter startup)")
+
+def main():
+    ready = time.perf_counter()
+    args = parse_engine_args(sys.argv[1:])
+    if args.startup_benchmark:
+        startup_benchmark(ready)
+        return
+    prof = None
+    if args.profile:
+        # Only the engine's hot paths are timed, never the protocol I/O
+        import profiler
+        prof = profiler.Profiler(sys.modules[__name__])
+        prof.enable()
+    try:
+        play_game(sys.stdin.readline, lambda line: print(line, flush=True), args.engine, args.workers,
+                  args.split_removal, args.nodes, args.depth)
+    finally:
+        if prof:
+            prof.disable()
+            prof.report(out=sys.stderr)
+            prof.write_collapsed(args.profile)
+
+load_weights()
+
 if __name__ == "__main__":
     main()
@@ -2,6 +2,8 @@ import sys
 import math
 import time
 
+from evalcache import EvalCache
+
 NEIGHBORS = {
     "a1": ["a4", "d1"],
     "a4": ["a1", "a7", "b4"],
@@ -303,10 +305,23 @@ def utility(state):
     return 0
 
 
+# score_board also looks at the move that led to the position, so it is part of the key
+EVAL_CACHE = EvalCache(1 << 17)
+
+
+def position_key(state, move):
+    board = state["board"]
+    return (tuple(board[p] for p in NEIGHBORS), state["in_hand"]["blue"], state["in_hand"]["orange"],
+            state["current_player"], move)
+
+
 def evaluate_or_utility(state, move):
-    if is_terminal(state):
-        return utility(state)
-    return score_board(state, move)
+    key = position_key(state, move)
+    value = EVAL_CACHE.get(key)
+    if value is None:
+        value = utility(state) if is_terminal(state) else score_board(state, move)
+        EVAL_CACHE.put(key, value)
+    return value
 
 
 def minimax(state, alpha, beta, depth, max_depth, maximizing, start_time, time_limit, previous_move):
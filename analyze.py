@@ -0,0 +1,156 @@
+import re
+import sys
+import math
+import time
+import argparse
+
+from StockMills import (
+    create_initial_board, apply_move, generate_moves, is_terminal, position_key,
+    position_to_notation, parse_notation, new_search_context, push_position,
+    minimax_alpha_beta, EVAL_CACHE
+)
+from gamerecord import read_transcript
+
+NOTATION = re.compile(r"^[BO.]{24}\s")
+
+
+def start_position():
+    return {"board": create_initial_board(), "in_hand": {"blue": 10, "orange": 10}, "current_player": "blue"}
+
+
+def play_moves(moves, state=None):
+    state = state or start_position()
+    for move in moves:
+        state = apply_move(state, *move)
+    return state
+
+
+def parse_position(text):
+    """A position in notation, or a comma-separated move list from the start position."""
+    text = text.strip()
+    if NOTATION.match(text):
+        return parse_notation(text)
+    moves = [tuple(m.split()) for m in text.split(",") if m.strip()]
+    return play_moves(moves)
+
+
+def analyse(state, multipv=1, max_depth=4, node_limit=None, time_limit=math.inf, split_removal=False,
+            include=None):
+    """
+    Iterative deepening that keeps the best `multipv` root moves with their lines.
+    Root moves are searched one by one with the k-th best score so far as alpha, so
+    moves that cannot make the top k are cut off cheaply. An iteration that runs out
+    of nodes or time is thrown away.
+    The root move `include` is always searched with a full window, so its exact score
+    at the same depth comes back too, as an extra line if it is not among the best.
+    Returns (lines, depth, nodes, seconds) where lines is a list of (score, moves).
+    """
+    start = time.time()
+    ctx = new_search_context()
+    ctx["node_limit"] = node_limit
+    ctx["split_removal"] = split_removal
+    push_position(ctx, position_key(state))
+    root_moves = generate_moves(state)
+    if include in root_moves:
+        # First, so even a cut-short first iteration has scored it
+        root_moves.remove(include)
+        root_moves.insert(0, include)
+    best_lines, best_depth = [], 0
+
+    def kept(lines):
+        return lines[:multipv] + [line for line in lines[multipv:] if line[1][0] == include]
+
+    for depth in range(1, max_depth + 1):
+        lines = []
+        for move in root_moves:
+            if move == include or len(lines) < multipv:
+                alpha = -math.inf
+            else:
+                alpha = lines[multipv - 1][0]
+            child = apply_move(state, *move)
+            val, _ = minimax_alpha_beta(child, alpha, math.inf, 1, depth, False, start, time_limit, ctx)
+            lines.append((val, [move] + ctx["pv"].get(1, [])))
+            lines.sort(key=lambda line: line[0], reverse=True)
+        if ctx["stopped"]:
+            if not best_lines:
+                best_lines, best_depth = kept(lines), depth
+            break
+        best_lines, best_depth = kept(lines), depth
+        # Search last iteration's best moves first
+        root_moves = [line[1][0] for line in lines]
+
+    return best_lines, best_depth, ctx["nodes"], time.time() - start
+
+
+def format_line(moves):
+    return "  ".join(" ".join(m) for m in moves)
+
+
+def report(state, args, out=sys.stdout):
+    if is_terminal(state):
+        print("terminal position", file=out)
+        return []
+    lines, depth, nodes, elapsed = analyse(state, args.multipv, args.depth, args.nodes, args.time,
+                                           args.split_removal)
+    nps = nodes / elapsed if elapsed > 0 else 0
+    print(f"depth {depth}  nodes {nodes}  time {elapsed:.2f}s  nps {nps:.0f}  "
+          f"eval cache {100 * EVAL_CACHE.hit_rate():.0f}% of {EVAL_CACHE.hits + EVAL_CACHE.misses}", file=out)
+    for i, (score, moves) in enumerate(lines, 1):
+        print(f"{i:2d}. {score:+8.0f}  {format_line(moves)}", file=out)
+    return lines
+
+
+def run_suite(path, args):
+    """
+    Each non-empty line is a position (notation or move list), optionally followed by
+    "; bm src tgt rem" giving the expected best move.
+    """
+    passed = total = 0
+    with open(path) as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            text, _, expect = line.partition(";")
+            state = parse_position(text)
+            print(position_to_notation(state))
+            lines = report(state, args)
+            expect = expect.split()
+            if expect and expect[0] == "bm":
+                total += 1
+                ok = bool(lines) and lines[0][1][0] == tuple(expect[1:4])
+                passed += ok
+                print("pass" if ok else f"FAIL (expected {' '.join(expect[1:4])})")
+            print()
+    if total:
+        print(f"{passed}/{total} passed")
+    return passed == total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse a Lasker Morris position with the StockMills search")
+    parser.add_argument("position", nargs="?", help='position notation, e.g. "........................ 10 10 b", '
+                                                    'or a comma-separated move list')
+    parser.add_argument("--moves", help="transcript file with one move per line, played from the start")
+    parser.add_argument("--suite", help="file of positions to analyse one after another")
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--nodes", type=int, default=None)
+    parser.add_argument("--time", type=float, default=math.inf)
+    parser.add_argument("--multipv", type=int, default=1)
+    parser.add_argument("--split-removal", action="store_true", help="search removals as their own ply")
+    args = parser.parse_args()
+
+    if args.suite:
+        sys.exit(0 if run_suite(args.suite, args) else 1)
+    if args.moves:
+        state = play_moves(read_transcript(args.moves))
+    elif args.position:
+        state = parse_position(args.position)
+    else:
+        state = start_position()
+    print(position_to_notation(state))
+    report(state, args)
+
+
+if __name__ == "__main__":
+    main()
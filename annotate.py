@@ -0,0 +1,140 @@
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import multiprocessing
+
+from StockMills import is_terminal, evaluate_or_utility, position_to_notation, parse_notation
+from gamerecord import iter_games, replay
+from analyze import analyse
+
+# A move that loses this much against the best move is marked as a blunder
+BLUNDER_LOSS = 150
+# Games replayed per round; their new positions are analysed before the next round
+GAMES_PER_ROUND = 64
+
+
+def analyse_position(args):
+    """
+    Pool job: a fixed-budget search of one position, given in notation, that scores
+    the move played there in the same root search as the best move. Returns
+    (notation, played, best score, best move, played move's score).
+    """
+    notation, played, node_limit, depth = args
+    state = parse_notation(notation)
+    lines = []
+    if not is_terminal(state):
+        lines, _, _, _ = analyse(state, 1, depth, node_limit, math.inf, include=tuple(played.split()))
+    if not lines:
+        score = evaluate_or_utility(state)
+        return notation, played, score, None, score
+    best_score, best_line = lines[0]
+    played_score = next((score for score, line in lines if " ".join(line[0]) == played), best_score)
+    return notation, played, best_score, " ".join(best_line[0]), played_score
+
+
+def load_jsonl(path):
+    """Records of a JSON-lines file; a line cut short by an interrupted run is skipped."""
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                pass
+
+
+def annotate_game(positions, moves, analysed, blunder_loss):
+    """
+    Per-move annotations from the analysed (position, move) pairs. A move's loss is the
+    best move's score minus its own, both from the same search of the position before it.
+    """
+    notes = []
+    for ply, (position, move) in enumerate(zip(positions, moves), 1):
+        played = " ".join(move)
+        best_score, best_move, played_score = analysed[position, played]
+        loss = best_score - played_score
+        notes.append({"ply": ply, "move": played, "score": best_score, "best": best_move,
+                      "loss": loss, "blunder": loss >= blunder_loss})
+    return notes
+
+
+def game_rounds(paths, done):
+    """
+    Stream the games not in `done` in rounds of GAMES_PER_ROUND, each game as
+    (file, offset, meta, result, positions in notation, moves), the position
+    before each move.
+    """
+    batch = []
+    for path in paths:
+        for offset, meta, result, codes in iter_games(path):
+            if (path, offset) in done:
+                continue
+            positions, moves = [], []
+            for state, move in replay(codes):
+                positions.append(position_to_notation(state))
+                moves.append(move)
+            batch.append((path, offset, meta, result, positions, moves))
+            if len(batch) == GAMES_PER_ROUND:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def run(paths, out, node_limit=20000, depth=99, workers=None, blunder_loss=BLUNDER_LOSS):
+    """
+    Annotate every game in the record files. Results go to `out` (one JSON line per
+    game) and every analysed position and played move to `out + ".positions"`, both
+    appended as soon as they are known, so a rerun after an interruption skips finished
+    games and positions. Positions are deduplicated, with the move played in them,
+    across all games and earlier runs.
+    """
+    cache_path = out + ".positions"
+    # Records without the played move's score are from before it was searched with the best move
+    analysed = {(r["position"], r["move"]): (r["score"], r["best"], r["played"])
+                for r in load_jsonl(cache_path) if "played" in r}
+    done = {(r["file"], r["offset"]) for r in load_jsonl(out)}
+    start = time.time()
+    searched = games = 0
+
+    with open(cache_path, "a") as cache, open(out, "a") as annotations, multiprocessing.Pool(workers) as pool:
+        for batch in game_rounds(paths, done):
+            todo = sorted({(p, " ".join(m)) for game in batch for p, m in zip(game[4], game[5])} - analysed.keys())
+            jobs = [(p, m, node_limit, depth) for p, m in todo]
+            for notation, move, score, best, played in pool.imap_unordered(analyse_position, jobs, chunksize=4):
+                analysed[notation, move] = (score, best, played)
+                cache.write(json.dumps({"position": notation, "move": move, "score": score, "best": best,
+                                        "played": played}) + "\n")
+                cache.flush()
+                searched += 1
+            for path, offset, meta, result, positions, moves in batch:
+                notes = annotate_game(positions, moves, analysed, blunder_loss)
+                annotations.write(json.dumps({"file": path, "offset": offset, "meta": meta, "result": result,
+                                              "moves": notes}) + "\n")
+                games += 1
+            annotations.flush()
+            elapsed = time.time() - start
+            print(f"\r{games} games, {searched} positions searched, {len(analysed)} known, "
+                  f"{searched / elapsed if elapsed else 0:.1f} searches/s", end="", file=sys.stderr, flush=True)
+    print(file=sys.stderr)
+    return games, searched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Annotate recorded games with engine scores, best moves and blunders")
+    parser.add_argument("records", nargs="+", help="game record files (see gamerecord.py)")
+    parser.add_argument("--out", required=True, help="annotations file (JSON lines); rerun to resume")
+    parser.add_argument("--nodes", type=int, default=20000, help="node budget per position")
+    parser.add_argument("--depth", type=int, default=99, help="depth limit per position")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--blunder", type=int, default=BLUNDER_LOSS, help="loss that marks a blunder")
+    args = parser.parse_args()
+    run(args.records, args.out, args.nodes, args.depth, args.workers, args.blunder)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import sys
+import time
+import argparse
+
+import numpy as np
+
+from StockMills import POINTS, POINT_INDEX, ADJACENCY, MILLS, hand_src
+from selfplay import NUMPY_DTYPE, encode_position
+
+N_POINTS = len(POINTS)
+ALL = (1 << N_POINTS) - 1
+
+# Positions and move targets are uint32 bitmasks, bit i = POINTS[i].
+# ADJ_MASK[s]: the points next to s. MILL_MASK[m]: the three points of mill m.
+ADJ_MASK = np.array([sum(1 << POINT_INDEX[q] for q in ADJACENCY[p]) for p in POINTS], dtype=np.uint32)
+MILL_MASK = np.array([sum(1 << POINT_INDEX[p] for p in line) for line in MILLS], dtype=np.uint32)
+# Every point lies on one horizontal and one vertical mill (MILLS lists the 8
+# horizontal ones first); POINT_MILLS[s] are the two mills through s
+N_ROWS = 8
+POINT_MILLS = np.array([[m for m, line in enumerate(MILLS) if p in line] for p in POINTS])
+BITS = np.arange(N_POINTS, dtype=np.uint32)
+
+
+def unpack(bitmasks):
+    """(...,) uint32 bitmasks -> (..., 24) bool."""
+    return (bitmasks[..., None] >> BITS & 1).astype(bool)
+
+
+def encode_states(states):
+    """State dicts -> structured array in the selfplay.py positions layout."""
+    data = b"".join(encode_position(state, 0) for state in states)
+    return np.frombuffer(data, dtype=NUMPY_DTYPE)
+
+
+def batch_moves(positions):
+    """
+    Legal moves for N positions at once. positions is a structured array with the
+    selfplay.py record layout (e.g. np.fromfile(path, dtype=NUMPY_DTYPE)).
+    Returns a dict of uint32 target bitmasks (bit t = POINTS[t]):
+      place        (N,)     empty points a stone from hand may be placed on
+      place_mill   (N,)     placements that close a mill
+      slide        (N, 24)  slide targets of the stone on each point
+      fly          (N, 24)  fly targets of the stone on each point
+      move_mill    (N, 24)  slide/fly targets that close a mill
+      removable    (N,)     opponent stones a mill may remove
+    and flying (N,) bool. Same rules as StockMills.generate_moves, which also
+    allows moving stones while stones remain in hand.
+    """
+    blue_to_move = positions["side"] == 0
+    mine = np.where(blue_to_move, positions["blue"], positions["orange"])
+    theirs = np.where(blue_to_move, positions["orange"], positions["blue"])
+    hand = np.where(blue_to_move, positions["hand_blue"], positions["hand_orange"])
+    empty = ~(mine | theirs) & ALL
+
+    # Per mill: our open twos point at their empty third point
+    my_lines = np.bitwise_count(mine[:, None] & MILL_MASK)
+    closing = np.where(my_lines == 2, MILL_MASK & empty[:, None], 0).astype(np.uint32)
+    by_row = np.bitwise_or.reduce(closing[:, :N_ROWS], axis=1)
+    by_column = np.bitwise_or.reduce(closing[:, N_ROWS:], axis=1)
+    place = np.where(hand > 0, empty, 0).astype(np.uint32)
+    place_mill = (by_row | by_column) & place
+
+    flying = np.bitwise_count(mine) + hand == 3
+    # ALL for each point we have a stone on, 0 elsewhere
+    sources = (mine[:, None] >> BITS & 1) * np.uint32(ALL)
+    fly_sources = sources & (flying * np.uint32(ALL))[:, None]
+    slide = ADJ_MASK & empty[:, None] & (sources ^ fly_sources)
+    fly = empty[:, None] & fly_sources
+    # Moving s onto a closing point completes the mill unless s is one of its two
+    # stones, i.e. the mill runs through s; a point closed by both its mills
+    # still completes the other one
+    through_source = closing[:, POINT_MILLS[:, 0]] | closing[:, POINT_MILLS[:, 1]]
+    lost = through_source & ~(by_row & by_column)[:, None]
+    move_mill = (by_row | by_column)[:, None] & ~lost & (slide | fly)
+
+    # Stones outside mills first; any stone when all of them are in mills
+    their_mills = np.where(np.bitwise_count(theirs[:, None] & MILL_MASK) == 3, MILL_MASK, 0).astype(np.uint32)
+    free = theirs & ~np.bitwise_or.reduce(their_mills, axis=1)
+    removable = np.where(free != 0, free, theirs)
+
+    return {"place": place, "place_mill": place_mill, "slide": slide, "fly": fly,
+            "move_mill": move_mill, "removable": removable, "flying": flying}
+
+
+def count_moves(masks):
+    """Number of (src, tgt, rem) moves per position, as len(generate_moves) counts them."""
+    extra = np.bitwise_count(masks["removable"]).astype(np.int64) - 1
+    placements = np.bitwise_count(masks["place"]) + np.bitwise_count(masks["place_mill"]) * extra
+    moves = np.bitwise_count(masks["slide"] | masks["fly"]).sum(axis=1)
+    mills = np.bitwise_count(masks["move_mill"]).sum(axis=1)
+    return placements + moves + mills * extra
+
+
+def moves_at(masks, i, color):
+    """Decode position i of a batch back into a list of (src, tgt, rem) moves."""
+    removals = [POINTS[r] for r in np.flatnonzero(unpack(masks["removable"][i]))]
+    moves = []
+    for t in np.flatnonzero(unpack(masks["place"][i])):
+        rems = removals if masks["place_mill"][i] >> t & 1 else ["r0"]
+        moves += [(hand_src(color), POINTS[t], r) for r in rems]
+    targets = unpack(masks["slide"][i] | masks["fly"][i])
+    mills = unpack(masks["move_mill"][i])
+    for s, t in zip(*np.nonzero(targets)):
+        rems = removals if mills[s, t] else ["r0"]
+        moves += [(POINTS[s], POINTS[t], r) for r in rems]
+    return moves
+
+
+def benchmark(positions, chunk=1024, repeat=3):
+    """Best-of-`repeat` positions per second over the whole array, in chunks of `chunk`."""
+    best = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for i in range(0, len(positions), chunk):
+            batch_moves(positions[i:i + chunk])
+        best = max(best, len(positions) / (time.perf_counter() - start))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch move generation over a positions file (see selfplay.py)")
+    parser.add_argument("positions")
+    parser.add_argument("--chunk", type=int, default=1024, help="positions per batch; small batches stay in cache")
+    parser.add_argument("--check", type=int, default=0, help="compare this many positions with generate_moves")
+    args = parser.parse_args()
+
+    positions = np.fromfile(args.positions, dtype=NUMPY_DTYPE)
+    rate = benchmark(positions, args.chunk)
+    print(f"{len(positions)} positions, {rate / 1e6:.2f}M positions/s")
+
+    if args.check:
+        from StockMills import generate_moves
+        from selfplay import decode_position
+        sample = positions[:args.check]
+        masks = batch_moves(sample)
+        counts = count_moves(masks)
+        for i, rec in enumerate(sample):
+            state = decode_position(rec["blue"], rec["orange"], rec["hand_blue"], rec["hand_orange"], rec["side"])
+            want = generate_moves(state)
+            if sorted(moves_at(masks, i, state["current_player"])) != sorted(want) or counts[i] != len(want):
+                print(f"mismatch at record {i}")
+                sys.exit(1)
+        print(f"{len(sample)} positions match generate_moves")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import os
+import sys
+import fcntl
+import pickle
+import shutil
+import signal
+import argparse
+import tempfile
+import socketserver
+
+import StockMills
+
+# One daemon per user; launcher.py connects to the same path
+SOCKET_PATH = os.environ.get("STOCKMILLS_SOCKET", f"/tmp/stockmills-{os.getuid()}.sock")
+
+
+class GameHandler(socketserver.StreamRequestHandler):
+    """One connection = one game, spoken in the referee's line protocol."""
+
+    def handle(self):
+        def readline():
+            return self.rfile.readline().decode()
+
+        def write(line):
+            self.wfile.write((line + "\n").encode())
+            self.wfile.flush()
+
+        try:
+            StockMills.play_game(readline, write, self.server.engine, self.server.workers,
+                                 self.server.split_removal, self.server.nodes, self.server.depth)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class EngineServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    # Each game runs in a process forked from this one: weights and tables are
+    # loaded once, before the fork, while concurrent games still get a core (and
+    # their full clock) each instead of sharing one interpreter lock. A finished
+    # game hands the evaluations it added back through cache_dir, and the daemon
+    # merges them into its own cache, which every later game is forked with
+    block_on_close = False
+    engine = "alphabeta"
+    workers = 1
+    split_removal = False
+    nodes = None
+    depth = None
+    lock = None
+    cache_dir = None
+
+    def finish_request(self, request, client_address):
+        # Runs in the forked game process, which must not keep the lock held
+        # after the daemon itself exits
+        if self.lock is not None:
+            self.lock.close()
+        known = {key for key, _ in StockMills.EVAL_CACHE.items()}
+        try:
+            super().finish_request(request, client_address)
+        finally:
+            self.save_cache(known)
+
+    def save_cache(self, known):
+        """In a game process: write the evaluations added during the game for the daemon."""
+        added = [(key, value) for key, value in StockMills.EVAL_CACHE.items() if key not in known]
+        if not added or self.cache_dir is None:
+            return
+        tmp = os.path.join(self.cache_dir, f"{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(added, f, pickle.HIGHEST_PROTOCOL)
+        # Renamed only once complete, so the daemon never reads a partial file
+        os.rename(tmp, tmp[:-len(".tmp")] + ".pickle")
+
+    def service_actions(self):
+        # In the daemon, between connections: reap finished games, merge their caches
+        super().service_actions()
+        if self.cache_dir is None:
+            return
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".pickle"):
+                path = os.path.join(self.cache_dir, name)
+                with open(path, "rb") as f:
+                    StockMills.EVAL_CACHE.update(pickle.load(f))
+                os.remove(path)
+
+
+def serve(path=SOCKET_PATH, engine="alphabeta", workers=1, split_removal=False, nodes=None, depth=None):
+    # Launchers started together may each spawn a daemon; only the one holding
+    # the lock serves, so no daemon unlinks a socket another one is serving on
+    lock = open(path + ".lock", "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        print(f"engine daemon already running on {path}", file=sys.stderr, flush=True)
+        lock.close()
+        return
+    if os.path.exists(path):
+        os.unlink(path)
+    with lock, EngineServer(path, GameHandler) as server:
+        server.engine = engine
+        server.workers = workers
+        server.split_removal = split_removal
+        server.nodes = nodes
+        server.depth = depth
+        server.lock = lock
+        server.cache_dir = tempfile.mkdtemp(prefix="stockmills-cache-")
+        os.chmod(path, 0o600)
+        print(f"engine daemon listening on {path}", file=sys.stderr, flush=True)
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(path)
+            shutil.rmtree(server.cache_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-lived StockMills engine serving games over a Unix socket")
+    parser.add_argument("--socket", default=SOCKET_PATH)
+    parser.add_argument("--engine", choices=["alphabeta", "mcts"], default="alphabeta")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--split-removal", action="store_true")
+    parser.add_argument("--nodes", type=int, help="node budget per move instead of the clock")
+    parser.add_argument("--depth", type=int, help="fixed search depth instead of the clock")
+    args = parser.parse_args()
+    # Exit through serve()'s cleanup on a plain kill as well
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        serve(args.socket, args.engine, args.workers, args.split_removal, args.nodes, args.depth)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+class EvalCache:
+    """
+    Fixed-size cache of leaf evaluations with least-recently-used eviction.
+    It relies on dicts keeping insertion order: a hit re-inserts the entry at the
+    end, so the first key is always the least recently used one.
+    Values must not be None. Only the evaluation is stored, never search results,
+    so it stays valid across searches until the evaluator itself changes (clear()).
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.entries.pop(key, None)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        entries = self.entries
+        entries[key] = value
+        if len(entries) > self.capacity:
+            del entries[next(iter(entries))]
+
+    def items(self):
+        """(key, value) pairs, least recently used first."""
+        return list(self.entries.items())
+
+    def update(self, items):
+        """Put every (key, value) pair, in order, e.g. entries computed by another process."""
+        for key, value in items:
+            self.put(key, value)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = 0
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self):
+        return len(self.entries)
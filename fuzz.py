@@ -0,0 +1,225 @@
+import sys
+import time
+import random
+import argparse
+import importlib
+import multiprocessing
+
+import reference_rules as ref
+
+COLORS = ("blue", "orange")
+
+
+class Candidate:
+    """
+    The rule functions of one move generator module, with its moves normalised to
+    (src, tgt, rem) tuples and "r0" for no removal (a.py uses None).
+    """
+
+    def __init__(self, name):
+        module = importlib.import_module(name)
+        self.name = name
+        self.generate = module.generate_moves
+        self.removals = module.possible_removals
+        self.apply = module.apply_move
+        self.terminal = module.is_terminal
+
+    def generate_moves(self, state):
+        return {(s, t, "r0" if r is None else r) for s, t, r in self.generate(state)}
+
+
+def snapshot(state):
+    # Only the fields the rules care about; caches a candidate keeps in its states are ignored
+    return (tuple(map(state["board"].get, ref.POINTS)),
+            state["in_hand"].get("blue"), state["in_hand"].get("orange"), state.get("current_player"))
+
+
+def copy_position(state):
+    return {"board": dict(state["board"]), "in_hand": dict(state["in_hand"]),
+            "current_player": state["current_player"]}
+
+
+def notation(state):
+    cells = "".join("B" if v == "blue" else "O" if v == "orange" else "." for v in snapshot(state)[0])
+    return f"{cells} {state['in_hand']['blue']} {state['in_hand']['orange']} {state['current_player'][0]}"
+
+
+def check_position(cand, state, cand_state=None, moves=None, ref_moves=None):
+    """
+    Compare cand with the reference at one position. cand_state is the candidate's
+    own copy of the position (so its incremental caches are exercised); moves are
+    the moves whose resulting positions are compared, all of them by default.
+    ref_moves, if given, are the reference moves for state.
+    Returns a list of (kind, detail) mismatches.
+    """
+    if cand_state is None:
+        cand_state = copy_position(state)
+    errors = []
+    if ref_moves is None:
+        ref_moves = ref.generate_moves(state)
+    try:
+        got = cand.generate_moves(cand_state)
+        if got != set(ref_moves):
+            errors.append(("moves", f"missing {sorted(set(ref_moves) - got)} extra {sorted(got - set(ref_moves))}"))
+        for color in COLORS:
+            want = ref.possible_removals(state["board"], color)
+            got = cand.removals(cand_state["board"], color)
+            if sorted(got) != sorted(want):
+                errors.append(("removals", f"{color}: expected {sorted(want)} got {sorted(got)}"))
+        want = ref.is_terminal(state, ref_moves)
+        if bool(cand.terminal(cand_state)) != want:
+            errors.append(("terminal", f"expected {want}"))
+        for move in ref_moves if moves is None else moves:
+            want = snapshot(ref.apply_move(state, *move))
+            got = snapshot(cand.apply(cand_state, *move))
+            if got != want:
+                errors.append(("apply", f"{' '.join(move)}"))
+    except Exception as e:
+        errors.append(("crash", f"{type(e).__name__}: {e}"))
+    return errors
+
+
+def simplifications(state):
+    """Positions one step simpler than state: a stone taken off, or a hand emptied or reduced."""
+    for p in ref.POINTS:
+        if state["board"][p] is not None:
+            simpler = copy_position(state)
+            simpler["board"][p] = None
+            yield simpler
+    for color in COLORS:
+        n = state["in_hand"][color]
+        for fewer in {0, n - 1} if n > 0 else ():
+            simpler = copy_position(state)
+            simpler["in_hand"][color] = fewer
+            yield simpler
+
+
+def shrink(cand, state, kinds):
+    """Greedily simplify state while the candidate still fails one of the same checks."""
+    def fails(s):
+        return any(kind in kinds for kind, _ in check_position(cand, s))
+
+    changed = True
+    while changed:
+        changed = False
+        for simpler in simplifications(state):
+            if fails(simpler):
+                state, changed = simpler, True
+                break
+    return state
+
+
+def random_trajectory(rng, max_plies, mill_bias):
+    """Random legal game from the start position, preferring mills so endgames are reached."""
+    state = {"board": {p: None for p in ref.POINTS}, "in_hand": {"blue": 10, "orange": 10},
+             "current_player": "blue"}
+    for _ in range(max_plies):
+        moves = ref.generate_moves(state)
+        if ref.is_terminal(state, moves):
+            yield state, moves, None
+            return
+        mills = [m for m in moves if m[2] != "r0"]
+        move = rng.choice(mills if mills and rng.random() < mill_bias else moves)
+        yield state, moves, move
+        state = ref.apply_move(state, *move)
+
+
+def fuzz(cand, positions, seed, max_plies=200, mill_bias=0.5, stop_after=1):
+    """
+    Check cand on `positions` positions from random trajectories. The candidate
+    replays each trajectory with its own apply_move, so mismatches in incremental
+    state show up where they happen; after a mismatch its state is resynced.
+    Returns (positions checked, [(kinds, shrunk position notation, details)]).
+    """
+    rng = random.Random(seed)
+    checked = 0
+    failures = []
+    seen = set()
+    while checked < positions and len(failures) < stop_after:
+        cand_state = None
+        for state, moves, move in random_trajectory(rng, max_plies, mill_bias):
+            if cand_state is None:
+                cand_state = copy_position(state)
+            errors = check_position(cand, state, cand_state, [move] if move else [], moves)
+            checked += 1
+            if errors:
+                kinds = {kind for kind, _ in errors}
+                small = shrink(cand, state, kinds)
+                key = notation(small)
+                if key not in seen:
+                    seen.add(key)
+                    failures.append((sorted(kinds), notation(small), check_position(cand, small)))
+                cand_state = None
+            elif move:
+                # The apply check passed, so this stays equal to the next reference position
+                cand_state = cand.apply(cand_state, *move)
+            if checked >= positions or len(failures) >= stop_after:
+                break
+    return checked, failures
+
+
+def fuzz_worker(args):
+    name, positions, seed, max_plies, mill_bias, stop_after = args
+    return fuzz(Candidate(name), positions, seed, max_plies, mill_bias, stop_after)
+
+
+def run(name, positions, seed, workers, max_plies=200, mill_bias=0.5, stop_after=1, chunk=20000):
+    """Fan fuzz() out over worker processes; returns (positions checked, failures, seconds)."""
+    start = time.time()
+    jobs = [(name, min(chunk, positions - i), seed * 1000003 + i, max_plies, mill_bias, stop_after)
+            for i in range(0, positions, chunk)]
+    checked, failures = 0, []
+    if workers > 1:
+        with multiprocessing.Pool(workers) as pool:
+            for n, found in pool.imap_unordered(fuzz_worker, jobs):
+                checked += n
+                failures += found
+                if len(failures) >= stop_after:
+                    pool.terminate()
+                    break
+    else:
+        for job in jobs:
+            n, found = fuzz_worker(job)
+            checked += n
+            failures += found
+            if len(failures) >= stop_after:
+                break
+    return checked, failures[:stop_after], time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Differential fuzzing of move generators against reference_rules.py")
+    parser.add_argument("candidates", nargs="*", default=["StockMills"], help="modules to check (default StockMills)")
+    parser.add_argument("--positions", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--max-plies", type=int, default=200)
+    parser.add_argument("--mill-bias", type=float, default=0.5, help="chance of playing a mill when one exists")
+    parser.add_argument("--stop-after", type=int, default=1, help="distinct shrunk mismatches to collect")
+    parser.add_argument("--position", help="check one position (notation) with every move instead of fuzzing")
+    args = parser.parse_args()
+
+    ok = True
+    for name in args.candidates:
+        if args.position:
+            from StockMills import parse_notation
+            errors = check_position(Candidate(name), parse_notation(args.position))
+            for kind, detail in errors:
+                print(f"{name}: {kind}: {detail}")
+            ok = ok and not errors
+            continue
+        checked, failures, elapsed = run(name, args.positions, args.seed, args.workers,
+                                         args.max_plies, args.mill_bias, args.stop_after)
+        rate = checked / elapsed if elapsed > 0 else 0
+        print(f"{name}: {checked} positions in {elapsed:.1f}s ({rate:.0f}/s, {60 * rate / 1e6:.2f}M/min), "
+              f"{len(failures)} mismatches")
+        for kinds, position, errors in failures:
+            print(f"  {','.join(kinds)} at {position}")
+            for kind, detail in errors[:5]:
+                print(f"    {kind}: {detail}")
+        ok = ok and not failures
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import os
+import mmap
+import json
+import struct
+import argparse
+
+from StockMills import POINTS, POINT_INDEX, create_initial_board, hand_src, apply_move
+
+# File layout: FILE_MAGIC, then games back to back. Each game is
+#   GAME_HEADER (meta length, move count, result), the meta as UTF-8 JSON
+#   (players, engine settings, ...), then one little-endian uint16 per move.
+# Files are only ever appended to, so a crashed writer leaves at most one
+# truncated game at the end. The reader ignores it and the next append cuts it off.
+FILE_MAGIC = b"LMGR\x01"
+GAME_HEADER = struct.Struct("<HHb")
+MOVE = struct.Struct("<H")
+
+# Move packing: source | target << 5 | removal << 10, each a POINTS index.
+HAND = 24
+NO_REMOVAL = 31
+
+RESULTS = {"blue": 1, "orange": -1, "draw": 0}
+
+
+def encode_move(source, target, remove):
+    src = HAND if source.startswith("h") else POINT_INDEX[source]
+    rem = NO_REMOVAL if remove == "r0" else POINT_INDEX[remove]
+    return src | POINT_INDEX[target] << 5 | rem << 10
+
+
+def decode_move(code, color):
+    src = code & 31
+    rem = code >> 10 & 31
+    source = hand_src(color) if src == HAND else POINTS[src]
+    remove = "r0" if rem == NO_REMOVAL else POINTS[rem]
+    return source, POINTS[code >> 5 & 31], remove
+
+
+def write_game(f, moves, result=0, meta=None):
+    meta_bytes = json.dumps(meta or {}, separators=(",", ":")).encode()
+    data = bytearray(GAME_HEADER.pack(len(meta_bytes), len(moves), result))
+    data += meta_bytes
+    for move in moves:
+        data += MOVE.pack(encode_move(*move))
+    f.write(data)
+
+
+def complete_length(f):
+    """
+    Length of the record file open as f up to the end of its last complete game,
+    found by walking the game headers; 0 if even the magic is incomplete.
+    """
+    end = f.seek(0, os.SEEK_END)
+    if end < len(FILE_MAGIC):
+        return 0
+    pos = len(FILE_MAGIC)
+    while pos + GAME_HEADER.size <= end:
+        f.seek(pos)
+        meta_len, n_moves, _ = GAME_HEADER.unpack(f.read(GAME_HEADER.size))
+        next_pos = pos + GAME_HEADER.size + meta_len + n_moves * MOVE.size
+        if next_pos > end:
+            break
+        pos = next_pos
+    return pos
+
+
+def append_game(path, moves, result=0, meta=None):
+    """
+    Append one game (a list of (src, tgt, rem) moves, blue first) to a record file.
+    A truncated game left by a crashed writer is cut off first, so the new game
+    starts where the reader expects the next header.
+    """
+    with open(path, "a+b") as f:
+        end = f.seek(0, os.SEEK_END)
+        length = complete_length(f)
+        if length < end:
+            f.truncate(length)
+        if length == 0:
+            f.write(FILE_MAGIC)
+        write_game(f, moves, result, meta)
+
+
+def iter_games(path):
+    """
+    Stream the games in a record file as (offset, meta, result, move codes).
+    The file is memory-mapped and walked one game at a time, so memory use does not
+    depend on file size.
+    """
+    if os.path.getsize(path) <= len(FILE_MAGIC):
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm[:len(FILE_MAGIC)] != FILE_MAGIC:
+            raise ValueError(f"{path} is not a game record file")
+        pos = len(FILE_MAGIC)
+        end = len(mm)
+        while pos + GAME_HEADER.size <= end:
+            meta_len, n_moves, result = GAME_HEADER.unpack_from(mm, pos)
+            body = pos + GAME_HEADER.size
+            moves_at = body + meta_len
+            if moves_at + n_moves * MOVE.size > end:
+                break
+            meta = json.loads(mm[body:moves_at]) if meta_len else {}
+            codes = [c for (c,) in MOVE.iter_unpack(mm[moves_at:moves_at + n_moves * MOVE.size])]
+            yield pos, meta, result, codes
+            pos = moves_at + n_moves * MOVE.size
+
+
+def replay(codes, state=None):
+    """
+    Replay packed moves through apply_move, yielding (state before the move, move).
+    """
+    if state is None:
+        state = {"board": create_initial_board(), "in_hand": {"blue": 10, "orange": 10}, "current_player": "blue"}
+    for code in codes:
+        move = decode_move(code, state["current_player"])
+        yield state, move
+        state = apply_move(state, *move)
+
+
+def is_move_text(parts):
+    return (len(parts) == 3
+            and (parts[0] in POINT_INDEX or parts[0] in ("h1", "h2"))
+            and parts[1] in POINT_INDEX
+            and (parts[2] in POINT_INDEX or parts[2] == "r0"))
+
+
+def read_transcript(path):
+    """Moves from a plain-text transcript: one "src tgt rem" per line, other lines ignored."""
+    moves = []
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if is_move_text(parts):
+                moves.append(tuple(parts))
+    return moves
+
+
+def check_crash_recovery():
+    """
+    Simulate writers that crashed partway through a game (inside the magic, the
+    header, the meta and the moves) and check that later appends are all read back
+    and the partial game is gone.
+    """
+    import tempfile
+    moves = [("h1", "a1", "r0"), ("h2", "a4", "r0"), ("h1", "d1", "r0")]
+    cases = {
+        "partial magic": FILE_MAGIC[:2],
+        "partial header": b"\x05\x00",
+        "partial meta": GAME_HEADER.pack(20, 3, 0) + b'{"bl',
+        "partial moves": GAME_HEADER.pack(2, 3, 0) + b"{}" + MOVE.pack(0),
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, partial in cases.items():
+            path = os.path.join(tmp, "records.lmgr")
+            kept = 0 if name == "partial magic" else 2
+            with open(path, "wb") as f:
+                if kept:
+                    f.write(FILE_MAGIC)
+                    for i in range(kept):
+                        write_game(f, moves, 1, {"game": i})
+                f.write(partial)
+            for i in range(kept, kept + 2):
+                append_game(path, moves, -1, {"game": i})
+            games = [meta.get("game") for _, meta, _, _ in iter_games(path)]
+            assert games == list(range(kept + 2)), f"{name}: read back games {games}"
+            print(f"{name}: ok")
+            os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lasker Morris game record files")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    imp = sub.add_parser("import", help="append a text transcript to a record file")
+    imp.add_argument("transcript")
+    imp.add_argument("records")
+    imp.add_argument("--blue", default="")
+    imp.add_argument("--orange", default="")
+    imp.add_argument("--result", choices=list(RESULTS), default="draw")
+
+    dump = sub.add_parser("dump", help="print every game in a record file")
+    dump.add_argument("records")
+
+    sub.add_parser("check", help="check that appends recover from a crashed writer")
+
+    args = parser.parse_args()
+    if args.cmd == "check":
+        check_crash_recovery()
+    elif args.cmd == "import":
+        meta = {"blue": args.blue, "orange": args.orange}
+        append_game(args.records, read_transcript(args.transcript), RESULTS[args.result], meta)
+    else:
+        for offset, meta, result, codes in iter_games(args.records):
+            moves = " | ".join(" ".join(move) for _, move in replay(codes))
+            print(f"{offset}\t{result:+d}\t{json.dumps(meta)}\t{moves}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Referee-facing stand-in for `python StockMills.py` that forwards the game to the
+engine daemon, starting the daemon first if it is not running:
+
+    cs4341-referee laskermorris -p1 "python launcher.py" -p2 "python launcher.py"
+
+Only the standard library is imported here so each game starts in milliseconds.
+"""
+import os
+import sys
+import time
+import socket
+import threading
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# Keep in sync with engine_daemon.SOCKET_PATH
+SOCKET_PATH = os.environ.get("STOCKMILLS_SOCKET", f"/tmp/stockmills-{os.getuid()}.sock")
+
+
+def connect(path=SOCKET_PATH):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def start_daemon(path=SOCKET_PATH, wait=5.0):
+    subprocess.Popen(
+        [sys.executable, os.path.join(HERE, "engine_daemon.py"), "--socket", path],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    deadline = time.time() + wait
+    while time.time() < deadline:
+        sock = connect(path)
+        if sock is not None:
+            return sock
+        time.sleep(0.02)
+    return None
+
+
+def pump_output(sock):
+    with sock.makefile("rb") as f:
+        for line in f:
+            sys.stdout.write(line.decode())
+            sys.stdout.flush()
+
+
+def main():
+    sock = connect() or start_daemon()
+    if sock is None:
+        # No daemon available: play in this process instead
+        sys.path.insert(0, HERE)
+        import StockMills
+        StockMills.main()
+        return
+
+    out = threading.Thread(target=pump_output, args=(sock,))
+    out.start()
+    try:
+        for line in sys.stdin:
+            sock.sendall(line.encode())
+    except (BrokenPipeError, ConnectionResetError):
+        pass
+    finally:
+        try:
+            sock.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+    out.join()
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import math
+import time
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from StockMills import generate_moves, apply_move, is_terminal
+from selfplay import game_result
+
+# Playouts that run this long without a winner count as draws
+MAX_PLAYOUT_PLIES = 200
+
+
+class Node:
+    __slots__ = ("move", "parent", "children", "untried", "visits", "wins", "player")
+
+    def __init__(self, state, move=None, parent=None):
+        self.move = move
+        self.parent = parent
+        self.children = {}
+        self.untried = None if is_terminal(state) else generate_moves(state)
+        self.visits = 0
+        # Wins are counted for the player who made `move`
+        self.wins = 0.0
+        self.player = "blue" if state["current_player"] == "orange" else "orange"
+
+    def uct_child(self, c):
+        log_n = math.log(self.visits)
+        return max(self.children.values(),
+                   key=lambda ch: ch.wins / ch.visits + c * math.sqrt(log_n / ch.visits))
+
+
+def playout(state, rng):
+    """
+    Cheap random playout that closes a mill whenever it can. Returns the winning
+    color, or None for a draw.
+    """
+    for _ in range(MAX_PLAYOUT_PLIES):
+        if is_terminal(state):
+            return "blue" if game_result(state) > 0 else "orange"
+        moves = generate_moves(state)
+        mills = [m for m in moves if m[2] != "r0"]
+        state = apply_move(state, *rng.choice(mills or moves))
+    return None
+
+
+def run_search(root, root_state, deadline, c, rng, max_playouts=None):
+    playouts = 0
+    while time.time() < deadline and (max_playouts is None or playouts < max_playouts):
+        node, state = root, root_state
+
+        # Selection
+        while node.untried == [] and node.children:
+            node = node.uct_child(c)
+            state = apply_move(state, *node.move)
+
+        # Expansion
+        if node.untried:
+            move = node.untried.pop(rng.randrange(len(node.untried)))
+            state = apply_move(state, *move)
+            child = Node(state, move, node)
+            node.children[move] = child
+            node = child
+
+        # Simulation
+        winner = playout(state, rng)
+
+        # Backpropagation
+        while node is not None:
+            node.visits += 1
+            if winner is None:
+                node.wins += 0.5
+            elif winner == node.player:
+                node.wins += 1
+            node = node.parent
+        playouts += 1
+    return playouts
+
+
+def search_worker(args):
+    """Independent search in a pool process; returns the root statistics only."""
+    state, deadline, c, seed = args
+    root = Node(state)
+    run_search(root, state, deadline, c, random.Random(seed))
+    return {move: (ch.visits, ch.wins) for move, ch in root.children.items()}
+
+
+class MCTSPlayer:
+    """
+    UCT search that keeps its tree between turns. With workers > 1, extra processes
+    search the same root independently and their root visit counts are added in
+    (root parallelisation).
+    """
+
+    def __init__(self, time_limit=4.5, workers=1, c=1.4, seed=None):
+        self.time_limit = time_limit
+        self.workers = workers
+        self.c = c
+        self.rng = random.Random(seed)
+        self.root = None
+        self.pool = None
+        self.last_playouts = 0
+
+    def advance(self, move):
+        """Follow a played move (ours or the opponent's) down the tree, if it was explored."""
+        if self.root is not None:
+            child = self.root.children.get(tuple(move))
+            if child is not None:
+                child.parent = None
+            self.root = child
+
+    def search(self, state):
+        if self.root is None:
+            self.root = Node(state)
+        if not self.root.untried and not self.root.children:
+            return None
+
+        deadline = time.time() + self.time_limit
+        futures = []
+        if self.workers > 1:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(self.workers - 1)
+            jobs = [(state, deadline, self.c, self.rng.getrandbits(32)) for _ in range(self.workers - 1)]
+            futures = [self.pool.submit(search_worker, job) for job in jobs]
+
+        self.last_playouts = run_search(self.root, state, deadline, self.c, self.rng)
+
+        visits = {move: ch.visits for move, ch in self.root.children.items()}
+        for future in futures:
+            for move, (n, _) in future.result().items():
+                visits[move] = visits.get(move, 0) + n
+        if not visits:
+            return None
+        return max(visits, key=visits.get)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
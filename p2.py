@@ -3,8 +3,6 @@ import sys
 import math
 import time
 import re
-from google import genai
-from dotenv import load_dotenv
 
 ADJACENCY = {
     "a1": ["a4", "d1"],
@@ -83,18 +81,30 @@ INVALID = {
     "g6",
 }
 
+# Board points in a fixed order (top row to bottom row), used for compact encodings
+POINTS = [
+    "a7", "d7", "g7",
+    "b6", "d6", "f6",
+    "c5", "d5", "e5",
+    "a4", "b4", "c4", "e4", "f4", "g4",
+    "c3", "d3", "e3",
+    "b2", "d2", "f2",
+    "a1", "d1", "g1"
+]
+
+MODEL = "gemini-2.0-flash"
+MAX_RETRIES = 4
+
+# Sent unchanged with every stateless request, so the prompt size never grows with the game
+COMPACT_RULES = f"""You are playing Lasker Morris. Positions are encoded as 24 characters, one per point in this order:
+{" ".join(POINTS)}
+B = blue stone, O = orange stone, . = empty. After the points come blue's stones in hand, orange's stones in hand,
+and the side to move (b or o). All legal moves are listed with a number; pick the strongest one.
+Reply with ONLY the move number inside tildes, e.g. ~3~."""
+
 def create_initial_board():
-    valid_points = [
-        "a7", "d7", "g7",
-        "b6", "d6", "f6",
-        "c5", "d5", "e5",
-        "a4", "b4", "c4", "e4", "f4", "g4",
-        "c3", "d3", "e3",
-        "b2", "d2", "f2",
-        "a1", "d1", "g1"
-    ]
     board = {}
-    for pt in valid_points:
+    for pt in POINTS:
         board[pt] = None
     return board
 
@@ -238,6 +248,71 @@ def extract_move_from_text(text):
             return tuple(parts)
     return None
 
+def encode_position(state):
+    """
+    Fixed-size position string: 24 point occupancies, stones in hand, side to move.
+    """
+    board = state["board"]
+    cells = "".join("B" if board[p] == "blue" else "O" if board[p] == "orange" else "." for p in POINTS)
+    return f"{cells} {state['in_hand']['blue']} {state['in_hand']['orange']} {state['current_player'][0]}"
+
+def build_compact_prompt(state, moves):
+    lines = [COMPACT_RULES, "", f"Position: {encode_position(state)}", "Moves:"]
+    for i, (s, t, r) in enumerate(moves):
+        lines.append(f"{i} {s} {t} {r}")
+    return "\n".join(lines)
+
+def extract_move_index(text, n_moves):
+    match = re.search(r'~\s*(\d+)\s*~', text or "")
+    if match:
+        idx = int(match.group(1))
+        if 0 <= idx < n_moves:
+            return idx
+    return None
+
+def record_turn_stats(stats, turn, attempt, prompt, response, latency):
+    """
+    Append one request's size and latency to stats, under its game turn and attempt
+    (1 = first request of the turn, higher = retries). Uses the API's token count when
+    the response carries usage metadata, otherwise a rough chars/4 estimate.
+    """
+    usage = getattr(response, "usage_metadata", None)
+    tokens = getattr(usage, "prompt_token_count", None) if usage is not None else None
+    if tokens is None:
+        tokens = len(prompt) // 4
+    entry = {"turn": turn, "attempt": attempt, "prompt_chars": len(prompt), "prompt_tokens": tokens,
+             "latency": latency}
+    stats.append(entry)
+    print(f"[stats] turn={turn} attempt={attempt} prompt_chars={entry['prompt_chars']} "
+          f"prompt_tokens={entry['prompt_tokens']} latency={latency:.3f}s", file=sys.stderr)
+    return entry
+
+def hey_google_stateless(state, client, model=MODEL, stats=None, turn=1):
+    """
+    One self-contained request per attempt: the compact position plus the numbered legal moves.
+    Nothing is carried over between turns, and a retry resends the same prompt instead of
+    growing a chat history. turn is our game turn, counted by the caller, for the stats.
+    """
+    moves = generate_moves(state)
+    if not moves:
+        return ("h1", "a1", "r0")
+    prompt = build_compact_prompt(state, moves)
+
+    for attempt in range(1, 2 + MAX_RETRIES):
+        try:
+            start = time.time()
+            response = client.models.generate_content(model=model, contents=prompt)
+            if stats is not None:
+                record_turn_stats(stats, turn, attempt, prompt, response, time.time() - start)
+            idx = extract_move_index(response.text, len(moves))
+            if idx is not None:
+                return moves[idx]
+        except Exception as e:
+            print(f"Error calling Gemini API: {e}", file=sys.stderr)
+            break
+
+    return moves[0]  # ai was not cooking
+
 def hey_google(state, chat):
 
     #for attempt in range(5):
@@ -299,7 +374,76 @@ def hey_google(state, chat):
     move = response.text
     return move
 
+class StubClient:
+    """
+    Stands in for genai.Client in stub_check: client.models.generate_content answers
+    with a move index, an unusable reply on every `bad_every`-th request, and raises
+    on the requests numbered in `fail_on`.
+    """
+
+    def __init__(self, bad_every=3, fail_on=(11,)):
+        self.models = self
+        self.bad_every = bad_every
+        self.fail_on = set(fail_on)
+        self.requests = 0
+
+    def generate_content(self, model, contents):
+        self.requests += 1
+        if self.requests in self.fail_on:
+            raise ConnectionError(f"stub request {self.requests} failed")
+        n_moves = len(contents.split("Moves:\n", 1)[1].splitlines())
+        if self.requests % self.bad_every == 0:
+            text = "I think the best move is the one in the middle."
+        else:
+            text = f"~{self.requests % n_moves}~"
+        return type("StubResponse", (), {"text": text, "usage_metadata": None})()
+
+def stub_check(max_turns=60):
+    """
+    Self-play with hey_google_stateless against StubClient, no API key needed. Checks that
+    every move is legal, that every request is logged under the game turn it was made
+    in (also after a turn whose request raised), that retries stay on their turn, and
+    that each prompt is built from the current position alone, so its size does not
+    grow with the game.
+    """
+    state = {"board": create_initial_board(), "in_hand": {"blue": 10, "orange": 10}, "current_player": "blue"}
+    client = StubClient()
+    stats = []
+    failed_turns = []
+    turn = 0
+    for turn in range(1, max_turns + 1):
+        if is_terminal(state):
+            break
+        moves = generate_moves(state)
+        logged, requests = len(stats), client.requests
+        move = tuple(hey_google_stateless(state, client, stats=stats, turn=turn))
+        assert move in moves, move
+        new = stats[logged:]
+        assert all(entry["turn"] == turn for entry in new), (turn, new)
+        assert [entry["attempt"] for entry in new] == list(range(1, len(new) + 1)), new
+        assert all(entry["prompt_chars"] == len(build_compact_prompt(state, moves)) for entry in new)
+        if client.requests > requests + len(new) and not new:
+            # The turn's only request raised, so it logged nothing
+            failed_turns.append(turn)
+        state = apply_move(state, *move)
+
+    assert failed_turns, "no failing request exercised"
+    assert any(entry["attempt"] > 1 for entry in stats), "no retries exercised"
+    assert stats[-1]["turn"] == turn or is_terminal(state), (stats[-1], turn)
+    sizes = [entry["prompt_chars"] for entry in stats]
+    print(f"stub check passed: {stats[-1]['turn']} turns, {len(stats)} requests "
+          f"(failed in turn {', '.join(map(str, failed_turns))}), prompt chars {min(sizes)}-{max(sizes)}")
+    return stats
+
 def main():
+    if "--stub-check" in sys.argv[1:]:
+        stub_check()
+        return
+
+    # Imported here so importing this module (or using its move helpers) stays cheap
+    from google import genai
+    from dotenv import load_dotenv
+
     board = create_initial_board()
     load_dotenv()
     in_hand = {"blue": 10, "orange": 10}
@@ -307,11 +451,16 @@ def main():
     api_key = os.environ.get("API_KEY")
 
     client = genai.Client(api_key = api_key)
-    chat = client.chats.create(model="gemini-2.0-flash")
     color = sys.stdin.readline().strip()
     if color not in ["blue", "orange"]:
         return
 
+    if "--stateless" in sys.argv[1:]:
+        play_stateless(state, color, client)
+        return
+
+    chat = client.chats.create(model=MODEL)
+
 
     prompt = """ I am about to play a text-based game of Lasker Morris and I want to make the best move possible.
     The board uses coordinates like a chessboard: `a1` is the bottom-left, and `g7` is the top-right. 
@@ -369,5 +518,30 @@ def main():
         except EOFError:
             break
 
+def play_stateless(state, color, client, model=MODEL):
+    stats = []
+    turn = 1
+    if color == "blue":
+        s, t, r = hey_google_stateless(state, client, model, stats, turn)
+        turn += 1
+        print(f"{s} {t} {r}", flush=True)
+        state = apply_move(state, s, t, r)
+
+    while True:
+        line = sys.stdin.readline().strip()
+        if not line or line.startswith("END"):
+            break
+
+        parts = line.split()
+        if len(parts) == 3:
+            o_src, o_tgt, o_rem = parts
+            state = apply_move(state, o_src, o_tgt, o_rem)
+
+        s, t, r = hey_google_stateless(state, client, model, stats, turn)
+        turn += 1
+        print(f"{s} {t} {r}", flush=True)
+        state = apply_move(state, s, t, r)
+    return stats
+
 if __name__ == "__main__":
     main()
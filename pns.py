@@ -0,0 +1,191 @@
+import sys
+import math
+import time
+import argparse
+
+from StockMills import (
+    generate_moves, apply_move, is_terminal, count_moves, position_key, parse_notation
+)
+from selfplay import game_result
+
+INF = math.inf
+
+# Low-material positions with a forced win for the side to move, for --check
+CHECK_POSITIONS = [
+    ".....O...BOB...O.......B 0 0 o",
+    ".......B...B..B.O...OO.. 0 0 o",
+    "..B....B.......O....O.BO 0 0 b",
+]
+
+
+class PNNode:
+    __slots__ = ("state", "key", "move", "parent", "children", "is_or", "pn", "dn")
+
+    def __init__(self, state, move, parent, is_or):
+        self.state = state
+        self.key = position_key(state)
+        self.move = move
+        self.parent = parent
+        self.children = None
+        # OR nodes: the attacker is to move and needs one winning move
+        self.is_or = is_or
+        self.pn = 1
+        self.dn = 1
+
+    def repeats(self, history):
+        # The root is the position being searched, which the game history already holds
+        if self.parent is None:
+            return False
+        node = self.parent
+        while node is not None:
+            if node.key == self.key:
+                return True
+            node = node.parent
+        return self.key in history
+
+
+def evaluate_leaf(node, attacker, history):
+    state = node.state
+    if is_terminal(state):
+        winner = "blue" if game_result(state) > 0 else "orange"
+        node.pn, node.dn = (0, INF) if winner == attacker else (INF, 0)
+    elif node.repeats(history):
+        # A repetition is a draw, which is not a win for the attacker
+        node.pn, node.dn = INF, 0
+    else:
+        # Mobility-based initial numbers: many replies make a node harder to (dis)prove
+        n = count_moves(state, state["current_player"])
+        node.pn, node.dn = (1, n) if node.is_or else (n, 1)
+
+
+def update_numbers(node):
+    if node.is_or:
+        node.pn = min(ch.pn for ch in node.children)
+        node.dn = sum(ch.dn for ch in node.children)
+    else:
+        node.pn = sum(ch.pn for ch in node.children)
+        node.dn = min(ch.dn for ch in node.children)
+
+
+def select_most_proving(node):
+    while node.children:
+        if node.is_or:
+            node = min(node.children, key=lambda ch: ch.pn)
+        else:
+            node = min(node.children, key=lambda ch: ch.dn)
+    return node
+
+
+def prune_solved(node):
+    """Drop subtrees that are no longer needed once node is solved; returns nodes freed."""
+    if not node.children:
+        return 0
+    if node.dn == 0:
+        freed, node.children = len(node.children), []
+    elif node.is_or:
+        # Keep the winning move only
+        keep = [min(node.children, key=lambda ch: ch.pn)]
+        freed, node.children = len(node.children) - 1, keep
+    else:
+        freed = 0
+    return freed
+
+
+def proof_number_search(state, max_nodes=200000, time_limit=INF, history=()):
+    """
+    Proof-number search for a forced win of the side to move. Memory is bounded by
+    max_nodes live nodes. Returns (result, line): result is "win", "no-win" or
+    "unknown", and line is the winning line for a proven win.
+    """
+    start = time.time()
+    attacker = state["current_player"]
+    history = set(history)
+    root = PNNode(state, None, None, True)
+    evaluate_leaf(root, attacker, history)
+    live = 1
+
+    while root.pn != 0 and root.dn != 0:
+        if live >= max_nodes or time.time() - start >= time_limit:
+            return "unknown", []
+        node = select_most_proving(root)
+        moves = generate_moves(node.state)
+        node.children = [PNNode(apply_move(node.state, *m), m, node, not node.is_or) for m in moves]
+        for child in node.children:
+            evaluate_leaf(child, attacker, history)
+        live += len(node.children)
+        while node is not None:
+            old = (node.pn, node.dn)
+            update_numbers(node)
+            if node.pn == 0 or node.dn == 0:
+                live -= prune_solved(node)
+            if (node.pn, node.dn) == old and node is not root:
+                break
+            node = node.parent
+
+    if root.dn == 0:
+        return "no-win", []
+    return "win", proven_line(root)
+
+
+def proven_line(node):
+    line = []
+    while node.children:
+        if node.is_or:
+            node = next(ch for ch in node.children if ch.pn == 0)
+        else:
+            # Every defence loses; show the one the proof needed most work for
+            node = max(node.children, key=lambda ch: len(ch.children or ()))
+        line.append(node.move)
+    return line
+
+
+def check(positions=CHECK_POSITIONS):
+    """
+    Play each position as play_game does, with its own key already in the game
+    history, and check that choose_move proves the win and plays it without
+    falling back to alpha-beta.
+    """
+    import StockMills
+
+    def no_search(*args, **kwargs):
+        raise AssertionError("choose_move searched a position proof-number search should prove")
+
+    search = StockMills.iterative_deepening
+    StockMills.iterative_deepening = no_search
+    try:
+        for notation in positions:
+            state = parse_notation(notation)
+            history = [position_key(state)]
+            result, line = proof_number_search(state, StockMills.PN_MAX_NODES, INF, history)
+            assert result == "win", f"{notation}: {result} with the game history"
+            move = StockMills.choose_move(state, 99, history, node_limit=20000, time_limit=INF)
+            assert move == line[0], f"{notation}: played {move}, proof starts {line[0]}"
+            print(f"{notation}: win, plays {' '.join(move)}")
+    finally:
+        StockMills.iterative_deepening = search
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prove or disprove a forced win for the side to move")
+    parser.add_argument("position", nargs="?", help="position notation, see analyze.py")
+    parser.add_argument("--nodes", type=int, default=200000)
+    parser.add_argument("--time", type=float, default=INF)
+    parser.add_argument("--check", action="store_true",
+                        help="check that choose_move plays proven wins from game positions")
+    args = parser.parse_args()
+    if args.check:
+        check()
+        return
+    if args.position is None:
+        parser.error("a position is required")
+
+    start = time.time()
+    result, line = proof_number_search(parse_notation(args.position), args.nodes, args.time)
+    print(f"{result} ({time.time() - start:.2f}s)")
+    if line:
+        print("  ".join(" ".join(m) for m in line))
+    sys.exit(0 if result != "unknown" else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import sys
+import math
+import time
+import inspect
+import argparse
+import functools
+
+import StockMills
+
+# Engine functions instrumented while profiling, grouped as in the report
+HOT_PATHS = {
+    "search": ["choose_move", "iterative_deepening", "minimax_alpha_beta", "search_removal"],
+    "move generation": ["generate_moves", "iter_moves", "flying_moves", "count_moves", "has_any_move",
+                        "is_legal_move"],
+    "removals": ["possible_removals", "can_remove_this_stone"],
+    "mill tests": ["is_stone_in_mill", "step_forms_mill", "forms_mill_after_placement", "forms_mill_after_move"],
+    "evaluation": ["evaluate_or_utility", "evaluate", "evaluation_features", "utility", "is_terminal"],
+    "state copying": ["apply_move", "clone_state"],
+}
+# An outermost call to one of these is one search
+SEARCH_ROOTS = ("choose_move", "iterative_deepening")
+
+
+class Profiler:
+    """
+    Opt-in instrumentation of the engine's hot paths. enable() swaps the functions in
+    HOT_PATHS for timing wrappers, in StockMills and in every loaded module that
+    imported them by name; disable() puts the originals back, so an engine that is
+    not being profiled runs exactly the code it always did.
+
+    Per function it records calls, inclusive time (outermost activation only, so
+    recursion is not counted twice) and self time. Self time is also recorded per
+    call stack for collapsed-stack flamegraph output. Each outermost call to a
+    SEARCH_ROOTS function closes one search in `searches`.
+    """
+
+    def __init__(self, module=StockMills, names=None):
+        self.module = module
+        self.names = names or [name for group in HOT_PATHS.values() for name in group]
+        self.patches = []
+        self.reset()
+
+    def reset(self):
+        self.calls = {}
+        self.total_ns = {}
+        self.self_ns = {}
+        self.stacks = {}
+        self.searches = []
+        self.stack = []
+        self.child_ns = [0]
+        self.active = {}
+
+    def enable(self):
+        if self.patches:
+            return
+        originals = {name: getattr(self.module, name) for name in self.names if hasattr(self.module, name)}
+        wrappers = {name: self.wrap(name, func) for name, func in originals.items()}
+        for mod in list(sys.modules.values()):
+            for name, func in originals.items():
+                if getattr(mod, name, None) is func:
+                    setattr(mod, name, wrappers[name])
+                    self.patches.append((mod, name, func))
+
+    def disable(self):
+        for mod, name, func in self.patches:
+            setattr(mod, name, func)
+        self.patches = []
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.disable()
+
+    def enter(self, name):
+        self.stack.append(name)
+        self.child_ns.append(0)
+        self.active[name] = self.active.get(name, 0) + 1
+        return time.perf_counter_ns()
+
+    def leave(self, name, started):
+        elapsed = time.perf_counter_ns() - started
+        own = elapsed - self.child_ns.pop()
+        self.child_ns[-1] += elapsed
+        key = ";".join(self.stack)
+        self.stack.pop()
+        self.active[name] -= 1
+        self.self_ns[name] = self.self_ns.get(name, 0) + own
+        self.stacks[key] = self.stacks.get(key, 0) + own
+        if not self.active[name]:
+            self.total_ns[name] = self.total_ns.get(name, 0) + elapsed
+            if name in SEARCH_ROOTS and not any(self.active.get(root) for root in SEARCH_ROOTS):
+                self.close_search()
+
+    def wrap(self, name, func):
+        profiler = self
+
+        if inspect.isgeneratorfunction(func):
+            # Time each resumption of the generator, not just its creation
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                profiler.calls[name] = profiler.calls.get(name, 0) + 1
+                gen = func(*args, **kwargs)
+                while True:
+                    started = profiler.enter(name)
+                    try:
+                        item = next(gen)
+                    except StopIteration:
+                        return
+                    finally:
+                        profiler.leave(name, started)
+                    yield item
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler.calls[name] = profiler.calls.get(name, 0) + 1
+            started = profiler.enter(name)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.leave(name, started)
+        return wrapper
+
+    def snapshot(self):
+        return {name: (self.calls.get(name, 0), self.total_ns.get(name, 0), self.self_ns.get(name, 0))
+                for name in self.calls}
+
+    def close_search(self):
+        """Record the counters since the previous search as one search."""
+        now = self.snapshot()
+        before = self.searches[-1][1] if self.searches else {}
+        delta = {name: tuple(a - b for a, b in zip(now[name], before.get(name, (0, 0, 0)))) for name in now}
+        self.searches.append((delta, now))
+
+    def report(self, stats=None, out=sys.stdout):
+        """Calls, inclusive and self time per function, grouped as in HOT_PATHS."""
+        stats = self.snapshot() if stats is None else stats
+        print(f"{'function':28s} {'calls':>10s} {'total ms':>10s} {'self ms':>10s} {'us/call':>8s}", file=out)
+        for group, names in HOT_PATHS.items():
+            rows = [(name, stats[name]) for name in names if name in stats and stats[name][0]]
+            if not rows:
+                continue
+            print(f"[{group}]", file=out)
+            for name, (calls, total, own) in rows:
+                print(f"  {name:26s} {calls:10d} {total / 1e6:10.1f} {own / 1e6:10.1f} {total / calls / 1e3:8.2f}",
+                      file=out)
+
+    def write_collapsed(self, path):
+        """One "frame;frame;frame microseconds" line per call stack, for flamegraph.pl and similar tools."""
+        with open(path, "w") as f:
+            for stack, ns in sorted(self.stacks.items()):
+                if ns >= 1000:
+                    f.write(f"{stack} {ns // 1000}\n")
+
+
+def profile_game(profiler, state, node_limit, depth, max_plies=200, out=sys.stdout):
+    """Self-play from state with reproducible searches, one report line per move."""
+    history = []
+    for ply in range(max_plies):
+        if StockMills.is_terminal(state):
+            break
+        move = StockMills.choose_move(state, depth or 99, history, node_limit=node_limit, time_limit=math.inf)
+        stats = profiler.searches[-1][0] if profiler.searches else {}
+        total = stats.get("choose_move", (0, 0, 0))[1]
+        gen = sum(stats.get(name, (0, 0, 0))[2] for name in HOT_PATHS["move generation"])
+        ev = sum(stats.get(name, (0, 0, 0))[2] for name in HOT_PATHS["evaluation"])
+        print(f"{ply + 1:3d}. {' '.join(move):12s} {total / 1e6:8.1f} ms  "
+              f"movegen {gen / 1e6:7.1f} ms  eval {ev / 1e6:7.1f} ms", file=out)
+        state = StockMills.apply_move(state, *move)
+        StockMills.record_position(history, state, move)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile the StockMills search on a position or a whole game")
+    parser.add_argument("position", nargs="?", default="........................ 10 10 b",
+                        help="position notation (default: start position)")
+    parser.add_argument("--nodes", type=int, default=20000, help="node budget per search")
+    parser.add_argument("--depth", type=int, default=None, help="fixed depth per search")
+    parser.add_argument("--game", action="store_true", help="play a whole game from the position")
+    parser.add_argument("--collapsed", help="write collapsed stacks here for flamegraph tools")
+    args = parser.parse_args()
+
+    state = StockMills.parse_notation(args.position)
+    with Profiler() as profiler:
+        if args.game:
+            profile_game(profiler, state, args.nodes, args.depth)
+        else:
+            StockMills.choose_move(state, args.depth or 99, node_limit=args.nodes, time_limit=math.inf)
+    profiler.report()
+    if args.collapsed:
+        profiler.write_collapsed(args.collapsed)
+
+
+if __name__ == "__main__":
+    main()
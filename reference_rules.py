@@ -0,0 +1,119 @@
+"""
+Frozen reference implementation of the rules, used by fuzz.py to check faster
+move generators. It is deliberately independent of StockMills.py and must only
+change when the rules themselves change, never for speed.
+
+Rules as StockMills.py has always played them: blue and orange start with 10
+stones in hand; closing a mill removes an opponent stone that is not in a mill,
+or any stone if all of them are; a player may move stones while stones remain in
+hand, and flies once stones on board plus stones in hand equal 3; a player with no
+stones in hand and at most 2 on the board, or with no legal move, has lost.
+"""
+
+POINTS = ["a7", "d7", "g7", "b6", "d6", "f6", "c5", "d5", "e5",
+          "a4", "b4", "c4", "e4", "f4", "g4", "c3", "d3", "e3",
+          "b2", "d2", "f2", "a1", "d1", "g1"]
+BIT = {p: 1 << i for i, p in enumerate(POINTS)}
+
+ADJACENCY = {
+    "a1": ["a4", "d1"], "a4": ["a1", "a7", "b4"], "a7": ["a4", "d7"],
+    "b2": ["b4", "d2"], "b4": ["b2", "b6", "a4", "c4"], "b6": ["b4", "d6"],
+    "c3": ["c4", "d3"], "c4": ["c3", "c5", "b4"], "c5": ["c4", "d5"],
+    "d1": ["a1", "g1", "d2"], "d2": ["d1", "b2", "d3", "f2"], "d3": ["d2", "c3", "e3"],
+    "d5": ["c5", "d6", "e5"], "d6": ["b6", "d5", "d7", "f6"], "d7": ["a7", "d6", "g7"],
+    "e3": ["d3", "e4"], "e4": ["e3", "e5", "f4"], "e5": ["d5", "e4"],
+    "f2": ["d2", "f4"], "f4": ["e4", "f2", "f6", "g4"], "f6": ["d6", "f4"],
+    "g1": ["d1", "g4"], "g4": ["g1", "f4", "g7"], "g7": ["d7", "g4"],
+}
+
+MILLS = [
+    ["a1", "a4", "a7"], ["b2", "b4", "b6"], ["c3", "c4", "c5"], ["d1", "d2", "d3"],
+    ["d5", "d6", "d7"], ["e3", "e4", "e5"], ["f2", "f4", "f6"], ["g1", "g4", "g7"],
+    ["a1", "d1", "g1"], ["b2", "d2", "f2"], ["c3", "d3", "e3"], ["a4", "b4", "c4"],
+    ["e4", "f4", "g4"], ["c5", "d5", "e5"], ["b6", "d6", "f6"], ["a7", "d7", "g7"],
+]
+
+# Bitmask tables: the stones of one color are a 24-bit int (bit i = POINTS[i])
+ADJ_MASK = {p: sum(BIT[q] for q in ADJACENCY[p]) for p in POINTS}
+POINT_MILL_MASKS = {p: [sum(BIT[q] for q in m) for m in MILLS if p in m] for p in POINTS}
+
+
+def other(color):
+    return "blue" if color == "orange" else "orange"
+
+
+def hand_src(color):
+    return "h1" if color == "blue" else "h2"
+
+
+def stones(board, color):
+    return sum(BIT[p] for p in POINTS if board[p] == color)
+
+
+def in_mill(bb, point):
+    # Every point lies on exactly two mills
+    m1, m2 = POINT_MILL_MASKS[point]
+    return bb & m1 == m1 or bb & m2 == m2
+
+
+def possible_removals(board, opp):
+    bb = stones(board, opp)
+    owned = [p for p in POINTS if bb & BIT[p]]
+    free = [p for p in owned if not in_mill(bb, p)]
+    return free or owned
+
+
+def generate_moves(state):
+    board = state["board"]
+    color = state["current_player"]
+    in_hand = state["in_hand"][color]
+    mine = stones(board, color)
+    empty = [p for p in POINTS if board[p] is None]
+    removals = None
+    moves = []
+
+    def add(src, tgt, after):
+        nonlocal removals
+        if in_mill(after, tgt):
+            if removals is None:
+                removals = possible_removals(board, other(color))
+            moves.extend((src, tgt, r) for r in removals)
+        else:
+            moves.append((src, tgt, "r0"))
+
+    if in_hand > 0:
+        for tgt in empty:
+            add(hand_src(color), tgt, mine | BIT[tgt])
+
+    owned = [p for p in POINTS if mine & BIT[p]]
+    flying = len(owned) + in_hand == 3
+    for src in owned:
+        for tgt in empty:
+            if flying or ADJ_MASK[src] & BIT[tgt]:
+                add(src, tgt, mine & ~BIT[src] | BIT[tgt])
+    return moves
+
+
+def apply_move(state, source, target, remove):
+    board = dict(state["board"])
+    in_hand = dict(state["in_hand"])
+    color = state["current_player"]
+    if source.startswith("h"):
+        in_hand[color] -= 1
+    else:
+        board[source] = None
+    board[target] = color
+    if remove != "r0":
+        board[remove] = None
+    return {"board": board, "in_hand": in_hand, "current_player": other(color)}
+
+
+def is_terminal(state, moves=None):
+    """moves, if given, must be generate_moves(state); it saves generating them again."""
+    board = state["board"]
+    for color in ("blue", "orange"):
+        if state["in_hand"][color] == 0 and bin(stones(board, color)).count("1") <= 2:
+            return True
+    if moves is None:
+        moves = generate_moves(state)
+    return not moves
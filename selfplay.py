@@ -0,0 +1,140 @@
+import os
+import sys
+import random
+import struct
+import argparse
+import multiprocessing
+
+from StockMills import (
+    POINTS, create_initial_board, generate_moves, apply_move,
+    is_terminal, count_on_board
+)
+
+# One labeled position per record (12 bytes):
+#   blue stones bitmask, orange stones bitmask (bit i = POINTS[i]),
+#   blue in hand, orange in hand, side to move (0 blue, 1 orange),
+#   game result (+1 blue won, 0 draw, -1 orange won)
+RECORD = struct.Struct("<IIBBBb")
+
+# Same layout for np.fromfile / np.memmap
+NUMPY_DTYPE = [("blue", "<u4"), ("orange", "<u4"), ("hand_blue", "u1"),
+               ("hand_orange", "u1"), ("side", "u1"), ("result", "i1")]
+
+
+def encode_position(state, result):
+    board = state["board"]
+    blue = orange = 0
+    for i, p in enumerate(POINTS):
+        if board[p] == "blue":
+            blue |= 1 << i
+        elif board[p] == "orange":
+            orange |= 1 << i
+    side = 0 if state["current_player"] == "blue" else 1
+    return RECORD.pack(blue, orange, state["in_hand"]["blue"], state["in_hand"]["orange"], side, result)
+
+
+def decode_position(blue, orange, hand_blue, hand_orange, side):
+    board = create_initial_board()
+    for i, p in enumerate(POINTS):
+        if blue >> i & 1:
+            board[p] = "blue"
+        elif orange >> i & 1:
+            board[p] = "orange"
+    return {
+        "board": board,
+        "in_hand": {"blue": int(hand_blue), "orange": int(hand_orange)},
+        "current_player": "blue" if side == 0 else "orange"
+    }
+
+
+def read_positions(path):
+    """Yield (state, result) for every record in a positions file."""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(RECORD.size * 4096)
+            if not chunk:
+                break
+            for blue, orange, hb, ho, side, result in RECORD.iter_unpack(chunk):
+                yield decode_position(blue, orange, hb, ho, side), result
+
+
+def game_result(state):
+    """+1 if blue won, -1 if orange won, for a terminal state."""
+    board = state["board"]
+    if state["in_hand"]["blue"] == 0 and count_on_board(board, "blue") <= 2:
+        return -1
+    if state["in_hand"]["orange"] == 0 and count_on_board(board, "orange") <= 2:
+        return 1
+    # Side to move has no legal move
+    return -1 if state["current_player"] == "blue" else 1
+
+
+def play_fast_game(rng, max_plies=200, mill_bias=0.9):
+    """
+    Cheap self-play: random moves, but a mill is closed whenever one is available
+    (with probability mill_bias). Returns the visited positions and the result;
+    games that hit max_plies count as draws.
+    """
+    state = {"board": create_initial_board(), "in_hand": {"blue": 10, "orange": 10}, "current_player": "blue"}
+    positions = []
+    for _ in range(max_plies):
+        if is_terminal(state):
+            return positions, game_result(state)
+        positions.append(state)
+        moves = generate_moves(state)
+        mills = [m for m in moves if m[2] != "r0"]
+        if mills and rng.random() < mill_bias:
+            move = rng.choice(mills)
+        else:
+            move = rng.choice(moves)
+        state = apply_move(state, *move)
+    return positions, 0
+
+
+def play_batch(args):
+    seed, games, max_plies, skip = args
+    rng = random.Random(seed)
+    out = bytearray()
+    for _ in range(games):
+        positions, result = play_fast_game(rng, max_plies)
+        for state in positions[skip:]:
+            out += encode_position(state, result)
+    return bytes(out)
+
+
+def generate(path, games, workers=None, seed=None, max_plies=200, skip=4, batch=50):
+    """
+    Play `games` self-play games across a process pool and append their positions to path.
+    Batch seeds are spaced far apart, so runs with neighbouring seeds play different
+    games. Without a seed the number of records already in the file is used, so
+    appending to a file never replays the games it already holds.
+    """
+    if seed is None:
+        seed = os.path.getsize(path) // RECORD.size if os.path.exists(path) else 0
+    jobs = [(seed * 1000003 + i, min(batch, games - i * batch), max_plies, skip)
+            for i in range((games + batch - 1) // batch)]
+    written = 0
+    with open(path, "ab") as f, multiprocessing.Pool(workers) as pool:
+        for chunk in pool.imap_unordered(play_batch, jobs):
+            f.write(chunk)
+            written += len(chunk) // RECORD.size
+            print(f"\r{written} positions", end="", file=sys.stderr, flush=True)
+    print(file=sys.stderr)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate labeled positions from fast self-play")
+    parser.add_argument("output", help="positions file to append to")
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None,
+                        help="default: the number of records already in the output file")
+    parser.add_argument("--max-plies", type=int, default=200)
+    parser.add_argument("--skip", type=int, default=4, help="opening plies not recorded")
+    args = parser.parse_args()
+    generate(args.output, args.games, args.workers, args.seed, args.max_plies, args.skip)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import os
+import sys
+import json
+import argparse
+
+import numpy as np
+
+from StockMills import FEATURE_NAMES, FEATURES_VERSION, DEFAULT_WEIGHTS, WEIGHTS_FILE, evaluation_features
+from selfplay import NUMPY_DTYPE, read_positions
+
+
+def load_dataset(path):
+    """
+    Feature matrix and targets for a positions file. Features are cached next to the
+    data file and rebuilt when the data is newer than the cache or the features changed.
+    """
+    cache = path + ".features.npz"
+    if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(path):
+        data = np.load(cache)
+        if list(data["names"]) == FEATURE_NAMES and data.get("version") == FEATURES_VERSION:
+            return data["X"], data["y"]
+
+    n = os.path.getsize(path) // np.dtype(NUMPY_DTYPE).itemsize
+    X = np.empty((n, len(FEATURE_NAMES)), dtype=np.float32)
+    for i, (state, _) in enumerate(read_positions(path)):
+        X[i] = evaluation_features(state)
+        if i % 100000 == 0:
+            print(f"\rfeatures {i}/{n}", end="", file=sys.stderr, flush=True)
+    print(file=sys.stderr)
+
+    # Result from the side to move's point of view: 1 win, 0.5 draw, 0 loss
+    rec = np.fromfile(path, dtype=NUMPY_DTYPE, count=n)
+    result = rec["result"].astype(np.float32)
+    result[rec["side"] == 1] *= -1
+    y = (result + 1) / 2
+
+    np.savez(cache, X=X, y=y, names=np.array(FEATURE_NAMES), version=FEATURES_VERSION)
+    return X, y
+
+
+def sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-np.clip(x, -50, 50)))
+
+
+def texel_loss(X, y, w, k):
+    return float(np.mean((y - sigmoid(k * (X @ w))) ** 2))
+
+
+def fit_scale(X, y, w):
+    """Find the sigmoid scale K that best maps the current weights' scores to results."""
+    best_k, best_loss = None, np.inf
+    for k in np.logspace(-5, -1, 41):
+        loss = texel_loss(X, y, w, k)
+        if loss < best_loss:
+            best_k, best_loss = k, loss
+    return best_k
+
+
+def tune(X, y, w, k, epochs=500, lr=1.0):
+    """
+    Minimise the Texel loss mean((y - sigmoid(k * Xw))^2) with full-batch Adam.
+    Every step is a couple of matrix-vector products over the whole dataset.
+    """
+    w = w.astype(np.float64).copy()
+    m = np.zeros_like(w)
+    v = np.zeros_like(w)
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+    for t in range(1, epochs + 1):
+        p = sigmoid(k * (X @ w))
+        grad = X.T @ ((p - y) * p * (1 - p)) * (2 * k / len(y))
+        m = beta1 * m + (1 - beta1) * grad
+        v = beta2 * v + (1 - beta2) * grad * grad
+        w -= lr * (m / (1 - beta1 ** t)) / (np.sqrt(v / (1 - beta2 ** t)) + eps)
+        if t % 50 == 0:
+            print(f"epoch {t}: loss {texel_loss(X, y, w, k):.6f}", file=sys.stderr)
+    return w
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit evaluation weights to self-play results (Texel method)")
+    parser.add_argument("data", help="positions file written by selfplay.py")
+    parser.add_argument("--output", default=WEIGHTS_FILE)
+    parser.add_argument("--epochs", type=int, default=500)
+    parser.add_argument("--lr", type=float, default=1.0)
+    args = parser.parse_args()
+
+    X, y = load_dataset(args.data)
+    X = X.astype(np.float64)
+    w0 = np.array([DEFAULT_WEIGHTS.get(name, 0) for name in FEATURE_NAMES], dtype=np.float64)
+    k = fit_scale(X, y, w0)
+    print(f"{len(y)} positions, K={k:.6f}, initial loss {texel_loss(X, y, w0, k):.6f}", file=sys.stderr)
+
+    w = tune(X, y, w0, k, args.epochs, args.lr)
+    print(f"final loss {texel_loss(X, y, w, k):.6f}", file=sys.stderr)
+
+    with open(args.output, "w") as f:
+        json.dump({name: round(float(val), 3) for name, val in zip(FEATURE_NAMES, w)}, f, indent=2)
+    print(f"wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()